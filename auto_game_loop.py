@@ -1,104 +1,156 @@
-import cv2
-import numpy as np
-import pyautogui
-import pydirectinput
-import time
-from main import detect_elements, press_keys, capture_pattern, wait_for_checkmark_cycle, is_rewards_screen, claim_rewards
-
-BLUE_BAR_REGION = (1401, 131, 121, 51)
-
-BLUE_BAR_COLOR = {
-    'lower': np.array([85, 100, 100]),
-    'upper': np.array([110, 255, 255])
+import clock
+from main import claim_rewards, TICK, PIPELINE, THRESHOLDS, ROUND_THRESHOLDS, state_present, count_region, wait_until, run_patterns, start_recording, stop_recording, start_metrics, start_bus, stop_bus, locate_ui, load_pattern_cache, save_pattern_cache
+from stage_metrics import METRICS
+from event_log import LOG
+from input_dispatch import dispatch, get_backend
+
+# Round transitions - driven by what is on screen, these are only safety limits
+ROUND = {
+    'start_timeout': 15.0,   # seconds inside the zone to wait for the first pattern
+    'walk_timeout': 10.0,    # seconds to hold 's' before giving up on reaching the zone
+    'walk_burst': 0.5,       # longest single hold of 's' - other clients get the input between bursts
+    'poll': 0.005
 }
-BLUE_THRESHOLD = 100
 
 
-def is_outside_game():
-    screenshot = pyautogui.screenshot(region=BLUE_BAR_REGION)
-    img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    mask_blue = cv2.inRange(hsv, BLUE_BAR_COLOR['lower'], BLUE_BAR_COLOR['upper'])
-    blue_pixels = cv2.countNonZero(mask_blue)
-    return blue_pixels > BLUE_THRESHOLD
+def is_outside_game(img=None, seq=None):
+    if img is None:
+        tick = TICK.grab(['blue_bar'])
+        img, seq = tick.view('blue_bar'), tick.seqs.get('blue_bar')
+    outside = state_present('blue_bar', img, seq)
+    if PIPELINE.recorder is not None:
+        PIPELINE.recorder.record_change('blue_bar', img, clock.now(), outside)
+    return outside
+
+
+def is_pattern_visible(img=None, seq=None):
+    """True once the countdown is over and a pattern is drawn in the pattern region.
+
+    Every pattern has a red or green glaze, so one must clear its detection
+    threshold - countdown digits alone can add up to the pixel total.
+    """
+    if img is None:
+        tick = TICK.grab(['pattern'])
+        img, seq = tick.view('pattern'), tick.seqs.get('pattern')
+    counts = count_region('pattern', img, seq)
+    glazed = any(counts[glaze] > THRESHOLDS[glaze] for glaze in ('green_glaze', 'red_glaze'))
+    return glazed and sum(counts[element] for element in THRESHOLDS) > ROUND_THRESHOLDS['pattern_visible']
 
 
 def walk_backward_until_inside():
-    print("Walking backward into trigger zone...")
-    while is_outside_game():
-        pydirectinput.press('s', _pause=False)
-        time.sleep(0.2)
-    print("✓ Inside trigger zone!")
+    """Hold 's' in short bursts and let go on the first frame without the blue bar"""
+    LOG.info('walk_start', "Walking backward into trigger zone...")
+    deadline = clock.now() + ROUND['walk_timeout']
+    inside = None
+    while inside is None and clock.now() < deadline:
+        # Each burst is one input batch, so 's' is never held while another client has the focus
+        # and the others are blocked for at most one burst
+        with get_backend().batch():
+            dispatch([('key_down', 's')])
+            try:
+                burst = min(ROUND['walk_burst'], deadline - clock.now())
+                inside = wait_until(lambda: not is_outside_game(), burst, ROUND['poll'])
+            finally:
+                dispatch([('key_up', 's')])
+    if inside is None:
+        LOG.warning('walk_timeout', "Still outside the trigger zone after {timeout:.0f}s", timeout=ROUND['walk_timeout'])
+    else:
+        LOG.info('walk_done', "✓ Inside trigger zone!")
+
+
+def wait_for_round_start():
+    """Walk in if needed, then wait out the countdown until the first pattern is visible.
+
+    Outside the zone -> walk; inside with an empty pattern region -> the
+    countdown is running; pattern visible -> go. Returns False if no
+    pattern shows up within ROUND['start_timeout'] of being inside.
+    """
+    deadline = clock.now() + ROUND['start_timeout']
+    countdown = False
+    while clock.now() < deadline:
+        tick = TICK.grab(['blue_bar', 'pattern'])
+        if is_outside_game(tick.view('blue_bar'), tick.seqs.get('blue_bar')):
+            walk_backward_until_inside()
+            deadline = clock.now() + ROUND['start_timeout']
+            countdown = False
+        elif is_pattern_visible(tick.view('pattern'), tick.seqs.get('pattern')):
+            return True
+        elif not countdown:
+            LOG.info('countdown_wait', "\nWaiting for game countdown...")
+            countdown = True
+        clock.sleep(ROUND['poll'])
+    return False
 
 
 def run_pattern_game():
-    print("\nWaiting 5 seconds for game countdown...")
-    time.sleep(5)
-    
-    print("Starting pattern detection!\n")
-    count = 0
+    if not wait_for_round_start():
+        LOG.warning('round_start_timeout', "No pattern after {timeout:.0f}s - starting detection anyway",
+                    timeout=ROUND['start_timeout'])
     
-    while True:
-        if is_rewards_screen():
-            claim_rewards()
-            break
-        
-        img = capture_pattern()
-        detected = detect_elements(img)
-        press_keys(detected)
-        
-        count += 1
-        print(f"Pattern {count} completed - waiting for next...")
-        
-        if not wait_for_checkmark_cycle():
-            claim_rewards()
-            break
+    LOG.info('patterns_start', "Starting pattern detection!\n")
+    count = run_patterns()
+    claim_rewards()
     
     return count
 
 
-def auto_loop(max_rounds=None):
-    print("=== Auto Game Loop ===")
-    print("Starting in 5 seconds... Alt-tab to game!")
-    print("Make sure you're standing BEHIND the trigger area")
-    time.sleep(5)
+def auto_loop(max_rounds=None, record=None, metrics=None, profiles=None, bus=False, locate=True):
+    if profiles:
+        # One worker process per client, each re-entering auto_loop with its own profile
+        from multi_client import run_clients
+        return run_clients(profiles, max_rounds)
+
+    LOG.info('loop_start', "=== Auto Game Loop ===\nStarting in 5 seconds... Alt-tab to game!\n"
+             "Make sure you're standing BEHIND the trigger area")
+    clock.sleep(5)
+    
+    if locate:
+        locate_ui()
+    if record:
+        start_recording(record)
+    exporter = start_metrics(metrics) if metrics else None
+    if bus:
+        start_bus()
+    load_pattern_cache()
     
     round_num = 0
     total_patterns = 0
-    start_time = time.time()
+    start_time = clock.now()
     
     try:
         while True:
             round_num += 1
-            print(f"\n{'='*50}")
-            print(f"ROUND {round_num}")
-            print(f"{'='*50}")
-            
-            if is_outside_game():
-                walk_backward_until_inside()
+            round_start = clock.now()
+            METRICS.begin_round(round_num)
+            LOG.info('round_start', "\n" + "="*50 + "\nROUND {round}\n" + "="*50, round=round_num)
             
             patterns = run_pattern_game()
             total_patterns += patterns
+            METRICS.record('round', clock.now() - round_start)
+            METRICS.end_round()
             
-            print(f"\n✓ Round {round_num} completed: {patterns} patterns")
+            LOG.info('round_done', "\n✓ Round {round} completed: {patterns} patterns", round=round_num, patterns=patterns)
             
             if max_rounds and round_num >= max_rounds:
                 break
-            
-            time.sleep(2)
     
     except KeyboardInterrupt:
-        print("\n\nStopped by user")
+        LOG.info('stopped', "\n\nStopped by user")
+    
+    finally:
+        stop_recording()
+        stop_bus()
+        save_pattern_cache()
+        if exporter:
+            exporter.stop()
     
-    elapsed = time.time() - start_time
-    print(f"\n{'='*50}")
-    print(f"SESSION COMPLETE")
-    print(f"{'='*50}")
-    print(f"Rounds completed: {round_num}")
-    print(f"Total patterns: {total_patterns}")
-    print(f"Total time: {elapsed:.1f}s")
+    elapsed = clock.now() - start_time
+    LOG.info('session_done', "\n" + "="*50 + "\nSESSION COMPLETE\n" + "="*50 +
+             "\nRounds completed: {rounds}\nTotal patterns: {patterns}\nTotal time: {elapsed:.1f}s",
+             rounds=round_num, patterns=total_patterns, elapsed=elapsed)
     if round_num > 0:
-        print(f"Average per round: {elapsed/round_num:.1f}s")
+        LOG.info('session_average', "Average per round: {average:.1f}s", average=elapsed / round_num)
+    LOG.flush()
 
 
 if __name__ == "__main__":
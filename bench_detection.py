@@ -0,0 +1,192 @@
+import argparse
+import glob
+import json
+import os
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import main
+from session_recorder import SessionReader, encode_result
+
+# detector name -> (region it reads, callable(img) -> result)
+DETECTORS = {
+    'detect_elements': ('pattern', lambda img: main.detect_elements(img, verbose=False)),
+    'is_checkmark_present': ('checkmark', main.is_checkmark_present),
+    'is_rewards_screen': ('rewards', main.is_rewards_screen),
+    # auto_game_loop.is_outside_game would also write to the session recorder
+    'is_outside_game': ('blue_bar', lambda img: main.state_present('blue_bar', img)),
+}
+
+
+def region_for_shape(shape):
+    """Guess which region an ROI capture belongs to from its size"""
+    for name, (x, y, w, h) in main.TICK.regions.items():
+        if shape[:2] == (h, w):
+            return name
+    return None
+
+
+def load_png_dir(path, labels_path=None):
+    """(name, region, img, expected) for every image in a directory of ROI captures"""
+    labels = {}
+    if labels_path:
+        with open(labels_path) as f:
+            labels = json.load(f)
+    frames = []
+    for file in sorted(glob.glob(os.path.join(path, '*.png'))):
+        img = cv2.imread(file)
+        name = os.path.basename(file)
+        region = region_for_shape(img.shape)
+        if region is None:
+            print(f"Skipping {name}: {img.shape[1]}x{img.shape[0]} matches no region")
+            continue
+        expected = labels.get(name)
+        frames.append((name, region, img, None if expected is None else encode_result(expected)))
+    return frames
+
+
+def load_session(path):
+    """(name, region, img, expected) for every frame of a recorded session - recorded results are the labels"""
+    reader = SessionReader(path)
+    frames = []
+    for i in range(len(reader)):
+        result = int(reader.index[i]['result'])
+        frames.append((f"#{i}", reader.region(i), reader.frame(i), None if result < 0 else result))
+    return frames
+
+
+def load_frames(path, labels_path=None):
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        return load_session(path)
+    return load_png_dir(path, labels_path)
+
+
+def percentile_ms(latencies, q):
+    return float(np.percentile(latencies, q)) * 1000
+
+
+def bench_detector(fn, images, repeat=1):
+    """Latency (s) per call over `repeat` passes, plus tracemalloc peak bytes per call"""
+    fn(images[0])  # warm-up: builds lookup tables lazily
+    latencies = []
+    for _ in range(repeat):
+        for img in images:
+            start = time.perf_counter()
+            fn(img)
+            latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    peaks = []
+    for img in images:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn(img)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - current)
+    tracemalloc.stop()
+    return latencies, peaks
+
+
+def run_benchmark(frames, repeat=1, detectors=DETECTORS):
+    report = {}
+    for name, (region, fn) in detectors.items():
+        selected = [f for f in frames if f[1] == region]
+        if not selected:
+            continue
+        images = [f[2] for f in selected]
+        latencies, peaks = bench_detector(fn, images, repeat)
+
+        labelled = [f for f in selected if f[3] is not None]
+        wrong = [f[0] for f in labelled if encode_result(fn(f[2])) != f[3]]
+
+        report[name] = {
+            'frames': len(images),
+            'p50_ms': percentile_ms(latencies, 50),
+            'p90_ms': percentile_ms(latencies, 90),
+            'p99_ms': percentile_ms(latencies, 99),
+            'max_ms': max(latencies) * 1000,
+            'fps': len(latencies) / sum(latencies),
+            'alloc_peak_bytes': int(np.mean(peaks)),
+            'labelled': len(labelled),
+            'mismatches': len(wrong),
+            'mismatched_frames': wrong[:20],
+        }
+    return report
+
+
+def stride_report(frames, strides, repeat=1):
+    """Speed and accuracy of strided pattern counting per stride, against the full-resolution result"""
+    selected = [f for f in frames if f[1] == 'pattern']
+    if not selected:
+        return {}
+    images = [f[2] for f in selected]
+    reference = [encode_result(main.detect_elements(img, verbose=False, stride=1)) for img in images]
+    labelled = [(i, f[3]) for i, f in enumerate(selected) if f[3] is not None]
+    report = {}
+    for stride in strides:
+        def fn(img):
+            return main.detect_elements(img, verbose=False, stride=stride)
+        latencies, _ = bench_detector(fn, images, repeat)
+        main.FAST_COUNT_STATS.update(coarse=0, escalated=0)
+        results = [encode_result(fn(img)) for img in images]
+        stats = main.FAST_COUNT_STATS
+        report[stride] = {
+            'frames': len(images),
+            'p50_ms': percentile_ms(latencies, 50),
+            'p90_ms': percentile_ms(latencies, 90),
+            'fps': len(latencies) / sum(latencies),
+            'agree': sum(r == ref for r, ref in zip(results, reference)) / len(images),
+            'escalated': stats['escalated'] / stats['coarse'] if stats['coarse'] else 0.0,
+            'labelled': len(labelled),
+            'mismatches': sum(results[i] != expected for i, expected in labelled),
+        }
+    return report
+
+
+def print_stride_report(report):
+    print(f"\n{'stride':>6} {'p50 ms':>8} {'p90 ms':>8} {'fps':>9} {'agree':>7} {'escalated':>10} {'correct':>10}")
+    for stride, r in report.items():
+        correct = f"{r['labelled'] - r['mismatches']}/{r['labelled']}" if r['labelled'] else "-"
+        print(f"{stride:6} {r['p50_ms']:8.3f} {r['p90_ms']:8.3f} {r['fps']:9.0f} {r['agree']:7.1%} "
+              f"{r['escalated']:10.1%} {correct:>10}")
+    print(f"(agree = same elements as stride 1; current FAST_COUNT stride is {main.FAST_COUNT['stride']})")
+
+
+def parse_strides(text):
+    return [int(s) for s in text.split(',') if s.strip()]
+
+
+def print_report(report):
+    print(f"\n{'detector':22} {'frames':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'fps':>9} {'alloc KB':>9} {'correct':>10}")
+    for name, r in report.items():
+        correct = f"{r['labelled'] - r['mismatches']}/{r['labelled']}" if r['labelled'] else "-"
+        print(f"{name:22} {r['frames']:7} {r['p50_ms']:8.3f} {r['p90_ms']:8.3f} {r['p99_ms']:8.3f} "
+              f"{r['max_ms']:8.3f} {r['fps']:9.0f} {r['alloc_peak_bytes'] / 1024:9.1f} {correct:>10}")
+        if r['mismatches']:
+            print(f"  mismatches: {', '.join(r['mismatched_frames'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded frames through every detector")
+    parser.add_argument('source', help="Directory of ROI PNGs or a recorded session directory")
+    parser.add_argument('--labels', help="JSON file mapping PNG name to expected result (dict of elements or bool)")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing passes over the frames")
+    parser.add_argument('--json', help="Also write the report to this file")
+    parser.add_argument('--strides', type=parse_strides,
+                        help="Comma-separated pattern count strides to compare, e.g. 1,2,3,4")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.labels)
+    print(f"Loaded {len(frames)} frames from {args.source}")
+    report = run_benchmark(frames, args.repeat)
+    print_report(report)
+    if args.strides:
+        report['strides'] = stride_report(frames, args.strides, args.repeat)
+        print_stride_report(report['strides'])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
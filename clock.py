@@ -0,0 +1,30 @@
+import time as _time
+
+# Game-time clock used by the loop logic. speed > 1 compresses time so the
+# simulator can push rounds through the unchanged loops faster than real time.
+_speed = 1.0
+_origin_real = _time.time()
+_origin_game = _origin_real
+
+
+def set_speed(speed):
+    """Run game time `speed` times faster than wall time from now on"""
+    global _speed, _origin_real, _origin_game
+    _origin_game = now()
+    _origin_real = _time.time()
+    _speed = float(speed)
+
+
+def speed():
+    return _speed
+
+
+def now():
+    """Current game time in seconds (wall-clock epoch based)"""
+    return _origin_game + (_time.time() - _origin_real) * _speed
+
+
+def sleep(seconds):
+    """Sleep for `seconds` of game time"""
+    if seconds > 0:
+        _time.sleep(seconds / _speed)
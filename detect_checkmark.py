@@ -1,36 +1,51 @@
 import cv2
-import numpy as np
-import pyautogui
 import time
 import os
-
-CHECKMARK_REGION = (1785, 191, 63, 65)
-
-CHECKMARK_WHITE = {
-    'lower': np.array([0, 0, 200]),
-    'upper': np.array([180, 30, 255])
-}
-
-WHITE_THRESHOLD = 50
+import frame_sources
+from frame_bus import FrameBus
+from detector_config import REGIONS, STATE_THRESHOLDS, get_detectors
 
 
 def capture_checkmark_region():
-    screenshot = pyautogui.screenshot(region=CHECKMARK_REGION)
-    img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    return img
+    return frame_sources.grab(REGIONS['checkmark']).copy()
 
 
 def detect_checkmark(img):
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    mask_white = cv2.inRange(hsv, CHECKMARK_WHITE['lower'], CHECKMARK_WHITE['upper'])
-    white_pixels = cv2.countNonZero(mask_white)
-    is_present = white_pixels > WHITE_THRESHOLD
+    white_pixels = get_detectors().count(img)['checkmark_white']
+    is_present = white_pixels > STATE_THRESHOLDS['checkmark_white']
     return is_present, white_pixels
 
 
+def bus_frames(bus):
+    """Yield (image, white pixel count) for each checkmark frame the running bot publishes"""
+    seq = 0
+    while True:
+        frame = bus.wait('checkmark', after=seq)
+        if frame is None:
+            continue
+        seq = frame.seq
+        if frame.counts is not None:
+            yield frame.image, frame.counts['checkmark_white']
+        else:
+            yield frame.image, detect_checkmark(frame.image)[1]
+
+
+def screen_frames():
+    while True:
+        img = capture_checkmark_region()
+        yield img, detect_checkmark(img)[1]
+        time.sleep(0.1)
+
+
 def run_detection():
-    print("Starting detection in 3 seconds...")
-    time.sleep(3)
+    try:
+        # Watch the running bot's frames rather than grabbing the screen alongside it
+        frames = bus_frames(FrameBus.attach())
+        print("Attached to the running bot's frame bus")
+    except FileNotFoundError:
+        frames = screen_frames()
+        print("Starting detection in 3 seconds...")
+        time.sleep(3)
     
     if not os.path.exists('checkmark_captures'):
         os.makedirs('checkmark_captures')
@@ -40,9 +55,8 @@ def run_detection():
     previous_state = None
     
     try:
-        while True:
-            img = capture_checkmark_region()
-            is_present, white_px = detect_checkmark(img)
+        for img, white_px in frames:
+            is_present = white_px > STATE_THRESHOLDS['checkmark_white']
             
             if is_present != previous_state:
                 timestamp = time.strftime("%H%M%S")
@@ -59,8 +73,6 @@ def run_detection():
                 
                 previous_state = is_present
             
-            time.sleep(0.1)
-            
     except KeyboardInterrupt:
         print("\nStopped")
 
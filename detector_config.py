@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from pixel_lut import DetectorContext, PixelClassifier, hsv_ranges
+from sparse_probe import load_probes
+
+# Screen regions (x, y, width, height)
+# Pattern: top-left (1652, 188) to bottom-right (1856, 390)
+REGIONS = {
+    'pattern': (1652, 188, 204, 202),
+    'checkmark': (1785, 191, 63, 65),
+    'rewards': (875, 653, 172, 51),   # Claim button region
+    'blue_bar': (1401, 131, 121, 51),  # Shown while standing outside the trigger zone
+    'exit': (896, 802, 120, 40),       # Around the Exit button
+}
+
+# Button centers (x, y)
+BUTTONS = {
+    'claim': (961, 678),  # Center of Claim button region
+    'exit': (956, 822),   # Center of Exit button
+}
+
+# Keybinds
+KEYBINDS = {
+    'green_glaze': 'q',
+    'red_glaze': 'e',
+    'blue_sprinkles': 'a',
+    'grapes': 's',
+    'eyes': 'd'
+}
+
+# Color ranges in HSV for pattern elements - PRECISE/SHARP colors only
+COLOR_RANGES = {
+    'green_glaze': {
+        'lower': [35, 150, 150],   # Bright lime/neon green
+        'upper': [85, 255, 255]
+    },
+    'red_glaze': {
+        'lower1': [0, 180, 180],    # Very sharp red/pink only - higher saturation
+        'upper1': [8, 255, 255],
+        'lower2': [170, 180, 180],  # Very sharp red/pink only - higher saturation
+        'upper2': [180, 255, 255]
+    },
+    'blue_sprinkles': {
+        'lower': [95, 120, 120],    # Sharp blue/cyan dots only
+        'upper': [115, 255, 255]
+    },
+    'grapes': {
+        'lower': [135, 100, 100],   # Sharp purple only
+        'upper': [155, 255, 255]
+    },
+    'eyes': {
+        'lower': [0, 25, 15],       # Dark brown/chocolate spots
+        'upper': [30, 180, 85]      # Wider range for brown tones
+    }
+}
+
+# Thresholds (minimum pixel count to consider element present)
+THRESHOLDS = {
+    'green_glaze': 1000,   # Needs substantial green
+    'red_glaze': 200,      # Based on actual detection (was 1000, saw 288)
+    'blue_sprinkles': 100,
+    'grapes': 40,          # Based on actual detection (was 200, saw 52)
+    'eyes': 60             # Lowered slightly to catch smaller eye spots
+}
+
+# Binary UI state colors in HSV
+STATE_COLORS = {
+    'checkmark_white': {
+        'lower': [0, 0, 200],
+        'upper': [180, 30, 255]
+    },
+    'rewards_green': {        # Green Claim button
+        'lower': [40, 100, 100],
+        'upper': [80, 255, 255]
+    },
+    'blue_bar': {
+        'lower': [85, 100, 100],
+        'upper': [110, 255, 255]
+    }
+}
+
+# Minimum pixel count for each UI state
+STATE_THRESHOLDS = {
+    'checkmark_white': 50,
+    'rewards_green': 500,  # Large green button
+    'blue_bar': 100
+}
+
+# Pixel counts that drive round transitions
+ROUND_THRESHOLDS = {
+    'pattern_visible': 200  # element pixels (all elements together) that mean a pattern is up
+}
+
+# Region each UI state is read from
+STATE_REGIONS = {
+    'checkmark_white': 'checkmark',
+    'rewards_green': 'rewards',
+    'blue_bar': 'blue_bar'
+}
+
+# Sparse probes built from reference captures (gingerbread.py build-probes)
+PROBE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'probes.json')
+
+# Reference capture of a static piece of the UI (gingerbread.py calibrate anchor)
+# used to fit REGIONS/BUTTONS to other screen sizes; unused until captured
+ANCHOR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'anchor.png')
+
+LUT_BITS = 8  # bits per BGR channel in the lookup table (8 = exact)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.detector_cache')
+CACHE_VERSION = 1
+
+
+def validate():
+    """Raise ValueError if any region, color range or threshold is malformed"""
+    for name, region in REGIONS.items():
+        if len(region) != 4 or region[2] <= 0 or region[3] <= 0:
+            raise ValueError(f"Region '{name}' must be (x, y, width, height) with positive size: {region}")
+    for name, pos in BUTTONS.items():
+        if len(pos) != 2:
+            raise ValueError(f"Button '{name}' must be (x, y): {pos}")
+    for name, spec in list(COLOR_RANGES.items()) + list(STATE_COLORS.items()):
+        ranges = hsv_ranges(spec)
+        if not ranges:
+            raise ValueError(f"Color '{name}' has no lower/upper bounds")
+        for lower, upper in ranges:
+            if lower.shape != (3,) or upper.shape != (3,):
+                raise ValueError(f"Color '{name}' bounds must be [H, S, V]")
+            if np.any(lower > upper):
+                raise ValueError(f"Color '{name}' has lower > upper: {lower.tolist()} / {upper.tolist()}")
+            if np.any(lower < 0) or upper[0] > 180 or np.any(upper[1:] > 255):
+                raise ValueError(f"Color '{name}' is outside H 0-180 / S,V 0-255")
+    if set(THRESHOLDS) != set(COLOR_RANGES):
+        raise ValueError("THRESHOLDS and COLOR_RANGES must name the same elements")
+    if set(STATE_THRESHOLDS) != set(STATE_COLORS):
+        raise ValueError("STATE_THRESHOLDS and STATE_COLORS must name the same states")
+    if set(KEYBINDS) != set(COLOR_RANGES):
+        raise ValueError("KEYBINDS and COLOR_RANGES must name the same elements")
+    for state, region in STATE_REGIONS.items():
+        if state not in STATE_COLORS or region not in REGIONS:
+            raise ValueError(f"STATE_REGIONS entry '{state}' -> '{region}' names an unknown state or region")
+
+
+def config_hash():
+    """Content hash of everything that goes into the compiled tables"""
+    payload = json.dumps({
+        'version': CACHE_VERSION,
+        'bits': LUT_BITS,
+        'colors': COLOR_RANGES,
+        'states': STATE_COLORS,
+    }, sort_keys=True, default=lambda v: np.asarray(v).tolist())
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def apply_profile(profile):
+    """Override regions/buttons/keybinds in place from a client profile dict.
+
+    Everything that holds REGIONS/BUTTONS/KEYBINDS (FrameTick, the claim
+    sequence) sees the new values without re-importing.
+    """
+    for name, region in profile.get('regions', {}).items():
+        REGIONS[name] = tuple(region)
+    for name, pos in profile.get('buttons', {}).items():
+        BUTTONS[name] = tuple(pos)
+    KEYBINDS.update(profile.get('keybinds', {}))
+    validate()
+
+
+class Detectors:
+    """Compiled, validated detector tables shared by every script"""
+
+    def __init__(self, classifier, probes=None):
+        self.classifier = classifier
+        self.context = DetectorContext(classifier)  # reusable counting buffers
+        self.probes = probes or {}
+        self.elements = list(COLOR_RANGES)
+
+    def count(self, img, classes=None):
+        return self.context.count(img, classes)
+
+    def probe(self, name, img):
+        """Sparse-probe answer for a UI state, None if there is no probe or the vote is ambiguous"""
+        probe = self.probes.get(name)
+        return None if probe is None else probe.vote(img, self.classifier)
+
+
+_detectors = None
+
+
+def compile_detectors(cache_dir=CACHE_DIR):
+    """Validate the config and build (or load from the on-disk cache) the lookup table"""
+    validate()
+    classes = {name: hsv_ranges(spec) for name, spec in COLOR_RANGES.items()}
+    classes.update({name: hsv_ranges(spec) for name, spec in STATE_COLORS.items()})
+    classifier = PixelClassifier(classes, bits=LUT_BITS)
+
+    path = os.path.join(cache_dir, f'detectors-{config_hash()}.npz')
+    try:
+        classifier.load(path)
+    except (OSError, ValueError, KeyError):
+        classifier.build()
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            classifier.save(path)
+        except OSError:
+            pass  # read-only checkout - just rebuild next time
+    return Detectors(classifier, load_probes(PROBE_FILE))
+
+
+def get_detectors():
+    """Process-wide compiled detectors, built on first use"""
+    global _detectors
+    if _detectors is None:
+        _detectors = compile_detectors()
+    return _detectors
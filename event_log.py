@@ -0,0 +1,125 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40, 'off': 100}
+
+
+class ConsoleSink:
+    def write(self, ts, level, event, text, fields):
+        sys.stdout.write(text + '\n')
+
+    def flush(self):
+        sys.stdout.flush()
+
+
+class RotatingFileSink:
+    """JSON-lines file rotated to path.1 .. path.N once it passes max_bytes"""
+
+    def __init__(self, path, max_bytes=10_000_000, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def write(self, ts, level, event, text, fields):
+        record = {'ts': ts, 'level': level, 'event': event, 'msg': text}
+        record.update(fields)
+        self.file.write(json.dumps(record, default=str) + '\n')
+        if self.file.tell() > self.max_bytes:
+            self._rotate()
+
+    def flush(self):
+        self.file.flush()
+
+
+class EventLog:
+    """Structured event log whose hot-path cost is one level check and a queue put.
+
+    emit() stores (time, level, event, template, fields); the background
+    thread does all string formatting and I/O. Records below `level` are
+    dropped before anything is built, so production runs at 'warning' pay
+    nothing for debug detail.
+    """
+
+    def __init__(self, level='debug'):
+        self.level = LEVELS[level]
+        self.queue = queue.Queue()
+        self.sinks = [ConsoleSink()]
+        self.thread = None
+        self.lock = threading.Lock()
+        self.tag = ''  # prefixed to every line, e.g. the client name in multi-client runs
+
+    def set_level(self, level):
+        self.level = LEVELS[level]
+
+    def enabled(self, level):
+        return LEVELS[level] >= self.level
+
+    def add_file(self, path, max_bytes=10_000_000, backups=3):
+        self.sinks.append(RotatingFileSink(path, max_bytes, backups))
+
+    def emit(self, level, event, template='', **fields):
+        if LEVELS[level] < self.level:
+            return
+        if self.thread is None:
+            self._start()
+        self.queue.put((time.time(), level, event, template, fields))
+
+    def debug(self, event, template='', **fields):
+        self.emit('debug', event, template, **fields)
+
+    def info(self, event, template='', **fields):
+        self.emit('info', event, template, **fields)
+
+    def warning(self, event, template='', **fields):
+        self.emit('warning', event, template, **fields)
+
+    def error(self, event, template='', **fields):
+        self.emit('error', event, template, **fields)
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            ts, level, event, template, fields = self.queue.get()
+            try:
+                text = template.format(**fields) if template else event
+                if self.tag:
+                    text = '\n'.join(f"[{self.tag}] {line}" for line in text.split('\n'))
+                for sink in self.sinks:
+                    sink.write(ts, level, event, text, fields)
+                if self.queue.empty():
+                    for sink in self.sinks:
+                        sink.flush()
+            except Exception as e:
+                sys.stderr.write(f"event_log: failed to write {event}: {e}\n")
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        if self.thread is not None:
+            self.queue.join()
+
+
+LOG = EventLog(os.environ.get('GINGERBREAD_LOG_LEVEL', 'debug'))
+if os.environ.get('GINGERBREAD_LOG_FILE'):
+    LOG.add_file(os.environ['GINGERBREAD_LOG_FILE'])
+atexit.register(LOG.flush)
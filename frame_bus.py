@@ -0,0 +1,204 @@
+"""Publish the running bot's frames for side tools.
+
+The bot writes every region it grabs into a small per-region ring in
+shared memory, plus the class counts its detectors computed for that
+frame. Monitors, recorders and calibrators attach read-only and get numpy
+views straight into that memory - no extra screen grabs, no copies.
+
+Layout: an int64 header length, a JSON header (regions, sizes, classes,
+slots, byte offsets), then one block per region:
+
+    seq                int64             last published sequence number
+    slot_seq[slots]    int64             sequence held by each slot, -1 while being written
+    timestamp[slots]   float64           clock.now() at capture
+    counts[slots, C]   int64             class counts, -1 until the bot classifies the frame
+    pixels[slots, H, W, 3] uint8
+"""
+import json
+import os
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import clock
+
+DEFAULT_NAME = os.environ.get('GINGERBREAD_BUS', 'gingerbread_bus')
+
+
+def attach_memory(name):
+    """Attach to another program's block without letting this process's exit unlink it"""
+    shm = shared_memory.SharedMemory(name=name, create=False)
+    # Attaching registers the block with our resource tracker as if we owned
+    # it, which would unlink it when this process exits. (Child processes of
+    # the owner share its tracker and should attach with SharedMemory directly.)
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+class BusFrame:
+    """One published region frame; `image` is a read-only view into the bus"""
+
+    def __init__(self, region, seq, timestamp, image, counts):
+        self.region = region
+        self.seq = seq
+        self.timestamp = timestamp
+        self.image = image
+        self.counts = counts
+
+
+class FrameBus:
+    """Per-region frame rings in shared memory with sequence counters.
+
+    Create with FrameBus.create(regions, classes) in the bot, attach with
+    FrameBus.attach() anywhere else. A view returned by latest() stays valid
+    until `slots` more frames of that region are published; check valid()
+    after using it if that matters.
+    """
+
+    def __init__(self, shm, header, owner):
+        self.shm = shm
+        self.owner = owner
+        self.lock = threading.Lock()  # bot threads publishing/annotating concurrently
+        self.slots = header['slots']
+        self.classes = header['classes']
+        self.regions = {}
+        for name, block in header['regions'].items():
+            h, w = block['height'], block['width']
+            offset = block['offset']
+            seq = np.ndarray((1,), np.int64, shm.buf, offset)
+            offset += 8
+            slot_seq = np.ndarray((self.slots,), np.int64, shm.buf, offset)
+            offset += 8 * self.slots
+            timestamps = np.ndarray((self.slots,), np.float64, shm.buf, offset)
+            offset += 8 * self.slots
+            counts = np.ndarray((self.slots, len(self.classes)), np.int64, shm.buf, offset)
+            offset += 8 * self.slots * len(self.classes)
+            pixels = np.ndarray((self.slots, h, w, 3), np.uint8, shm.buf, offset)
+            if not owner:
+                for array in (seq, slot_seq, timestamps, counts, pixels):
+                    array.flags.writeable = False
+            self.regions[name] = (seq, slot_seq, timestamps, counts, pixels)
+
+    @classmethod
+    def create(cls, regions, classes, slots=4, name=DEFAULT_NAME):
+        """Allocate a bus for `regions` ({name: (x, y, w, h)}), replacing a stale one"""
+        classes = list(classes)
+        blocks = {}
+        size = 0
+        for region, (_, _, w, h) in regions.items():
+            blocks[region] = {'width': w, 'height': h, 'offset': size}
+            size += _align(8 + 8 * slots * (2 + len(classes)) + slots * h * w * 3)
+        header = {'slots': slots, 'classes': classes, 'regions': blocks}
+        # Room for the offsets growing by `start` once it is known
+        start = _align(8 + len(json.dumps(header)) + 16 * len(blocks))
+        for block in blocks.values():
+            block['offset'] += start
+        encoded = json.dumps(header).encode().ljust(start - 8)
+
+        try:
+            shared_memory.SharedMemory(name=name).unlink()  # left behind by a crashed run
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=start + size)
+        np.ndarray((1,), np.int64, shm.buf)[0] = len(encoded)
+        shm.buf[8:start] = encoded
+        bus = cls(shm, header, owner=True)
+        for seq, slot_seq, _, counts, _ in bus.regions.values():
+            seq[0] = 0
+            slot_seq[:] = -1
+            counts[:] = -1
+        return bus
+
+    @classmethod
+    def attach(cls, name=DEFAULT_NAME):
+        """Read-only view of a running bot's bus; FileNotFoundError if none is running"""
+        shm = attach_memory(name)
+        length = int(np.ndarray((1,), np.int64, shm.buf)[0])
+        header = json.loads(bytes(shm.buf[8:8 + length]).rstrip(b' '))
+        return cls(shm, header, owner=False)
+
+    # -- writer ----------------------------------------------------------
+
+    def publish(self, region, img, timestamp):
+        """Copy one region frame into its ring (bot side); returns its sequence number, None if not published"""
+        block = self.regions.get(region)
+        if block is None:
+            return None
+        seq, slot_seq, timestamps, counts, pixels = block
+        if img.shape != pixels.shape[1:]:
+            return None  # region was resized after the bus was created
+        with self.lock:
+            n = int(seq[0]) + 1
+            slot = n % self.slots
+            slot_seq[slot] = -1
+            pixels[slot] = img
+            timestamps[slot] = timestamp
+            counts[slot] = -1
+            slot_seq[slot] = n
+            seq[0] = n
+        return n
+
+    def publish_tick(self, tick, names):
+        """Publish the named regions of a FrameTick -> {region: sequence number}"""
+        seqs = {}
+        for name in names:
+            n = self.publish(name, tick.view(name), tick.timestamp)
+            if n is not None:
+                seqs[name] = n
+        return seqs
+
+    def set_counts(self, region, seq, counts):
+        """Attach class counts to published frame `seq` (bot side), unless its slot was reused already"""
+        block = self.regions.get(region)
+        if block is None:
+            return
+        _, slot_seq, _, slot_counts, _ = block
+        slot = seq % self.slots
+        with self.lock:
+            if int(slot_seq[slot]) == seq:
+                slot_counts[slot] = [counts[c] for c in self.classes]
+
+    # -- readers ---------------------------------------------------------
+
+    def seq(self, region):
+        return int(self.regions[region][0][0])
+
+    def valid(self, region, seq):
+        """True while the slot that held frame `seq` has not been reused"""
+        return int(self.regions[region][1][seq % self.slots]) == seq
+
+    def latest(self, region):
+        """Newest frame of a region, or None if nothing was published yet"""
+        seq, slot_seq, timestamps, counts, pixels = self.regions[region]
+        n = int(seq[0])
+        if n == 0:
+            return None
+        slot = n % self.slots
+        if int(slot_seq[slot]) != n:
+            return None  # overwritten between the two reads - caller retries
+        row = counts[slot]
+        frame_counts = None if row[0] < 0 else dict(zip(self.classes, row.tolist()))
+        return BusFrame(region, n, float(timestamps[slot]), pixels[slot], frame_counts)
+
+    def wait(self, region, after=0, timeout=1.0, poll=0.005):
+        """Block until a frame newer than `after` is published; None on timeout"""
+        deadline = clock.now() + timeout
+        while True:
+            if self.seq(region) > after:
+                frame = self.latest(region)
+                if frame is not None:
+                    return frame
+            if clock.now() >= deadline:
+                return None
+            clock.sleep(poll)
+
+    def close(self):
+        self.regions = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
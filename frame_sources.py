@@ -0,0 +1,239 @@
+import glob
+import os
+import threading
+
+import cv2
+import numpy as np
+
+import clock
+import stage_metrics
+
+
+class FrameSource:
+    """Where screen pixels come from.
+
+    grab(region) takes an (x, y, width, height) tuple in screen coordinates
+    and returns a BGR uint8 image of shape (height, width, 3). The result may
+    be a view into a backend buffer; copy it if it must outlive the next grab.
+    A region the backend cannot capture raises ValueError.
+
+    grab_many(regions) captures several regions as one moment of the screen
+    (one FrameTick); backends whose frames advance per call override it.
+    """
+
+    def grab(self, region):
+        raise NotImplementedError
+
+    def grab_many(self, regions):
+        return [self.grab(region) for region in regions]
+
+    def close(self):
+        pass
+
+
+class PyAutoGuiSource(FrameSource):
+    """Original capture path: pyautogui -> PIL -> RGB array -> BGR.
+
+    The BGR conversion writes into a rotating pool of `pool` buffers per
+    frame size and per thread, so a returned frame stays intact for the
+    next pool - 1 grabs of the same size from the same thread (more than
+    the pipeline's frame ring holds) whatever else is grabbed meanwhile. np.asarray still
+    copies each PIL screenshot into a fresh RGB array; only the BGR frames
+    are pooled.
+    """
+
+    def __init__(self, pool=8):
+        import pyautogui
+        self._pyautogui = pyautogui
+        self.pool = pool
+        self._local = threading.local()  # pools are per thread - no two grabs share a buffer
+
+    def _buffer(self, shape):
+        local = self._local
+        if not hasattr(local, 'buffers'):
+            local.buffers = {}
+            local.next = {}  # shape -> index of its next buffer, so each size cycles its whole pool
+        buffers = local.buffers.get(shape)
+        if buffers is None:
+            buffers = local.buffers[shape] = [np.empty(shape, dtype=np.uint8) for _ in range(self.pool)]
+        index = local.next.get(shape, 0)
+        local.next[shape] = index + 1
+        return buffers[index % self.pool]
+
+    def grab(self, region):
+        screenshot = self._pyautogui.screenshot(region=region)
+        with stage_metrics.timer('convert'):
+            rgb = np.asarray(screenshot)
+            return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=self._buffer(rgb.shape))
+
+
+class MssSource(FrameSource):
+    """Low-latency grabber - mss hands back BGRA, we drop alpha with a view"""
+
+    def __init__(self):
+        import mss
+        self._mss = mss
+        self._local = threading.local()  # mss handles are not thread-safe
+
+    def _grabber(self):
+        grabber = getattr(self._local, 'grabber', None)
+        if grabber is None:
+            grabber = self._local.grabber = self._mss.mss()
+        return grabber
+
+    def grab(self, region):
+        x, y, w, h = region
+        try:
+            shot = self._grabber().grab({'left': x, 'top': y, 'width': w, 'height': h})
+        except self._mss.exception.ScreenShotError as e:
+            raise ValueError(f"Could not grab {region}: {e}") from e
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(h, w, 4)
+        return bgra[:, :, :3]
+
+    def close(self):
+        grabber = getattr(self._local, 'grabber', None)
+        if grabber is not None:
+            grabber.close()
+            self._local.grabber = None
+
+
+class ReplaySource(FrameSource):
+    """Replay a directory of screenshots or a video file.
+
+    Every grab - or grab_many, i.e. every FrameTick - advances one frame.
+    Frames are treated as screenshots whose top-left pixel sits at `origin`
+    in screen coordinates.
+    """
+
+    IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg', '*.bmp')
+
+    def __init__(self, path, origin=(0, 0), loop=True):
+        self.path = path
+        self.origin = origin
+        self.loop = loop
+        self.index = 0
+        self._files = None
+        self._video = None
+        if os.path.isdir(path):
+            files = []
+            for pattern in self.IMAGE_PATTERNS:
+                files.extend(glob.glob(os.path.join(path, pattern)))
+            self._files = sorted(files)
+            if not self._files:
+                raise ValueError(f"No images found in {path}")
+        else:
+            self._video = cv2.VideoCapture(path)
+            if not self._video.isOpened():
+                raise ValueError(f"Could not open video {path}")
+
+    def _next_frame(self):
+        if self._files is not None:
+            if self.index >= len(self._files):
+                if not self.loop:
+                    raise EOFError("Replay finished")
+                self.index = 0
+            frame = cv2.imread(self._files[self.index])
+            self.index += 1
+            return frame
+
+        ok, frame = self._video.read()
+        if not ok:
+            if not self.loop:
+                raise EOFError("Replay finished")
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._video.read()
+            if not ok:
+                raise EOFError("Replay finished")
+        self.index += 1
+        return frame
+
+    def grab(self, region):
+        return self._crop(self._next_frame(), region)
+
+    def grab_many(self, regions):
+        """Every region from the same replayed frame - one frame per tick"""
+        frame = self._next_frame()
+        return [self._crop(frame, region) for region in regions]
+
+    def _crop(self, frame, region):
+        x, y, w, h = region
+        ox, oy = self.origin
+        x, y = x - ox, y - oy
+        if x < 0 or y < 0 or y + h > frame.shape[0] or x + w > frame.shape[1]:
+            raise ValueError(f"Region {region} is outside the replayed frame")
+        return frame[y:y + h, x:x + w]
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+
+
+def fill_background(region, t):
+    """Default synthetic renderer - flat neutral gray"""
+    return np.full((region[3], region[2], 3), 128, dtype=np.uint8)
+
+
+class SyntheticSource(FrameSource):
+    """Generate frames from a render(region, t) callable, t = seconds since start"""
+
+    def __init__(self, render=fill_background):
+        self.render = render
+        self.start = clock.now()
+
+    def grab(self, region):
+        return self.render(region, clock.now() - self.start)
+
+
+BACKENDS = {
+    'pyautogui': PyAutoGuiSource,
+    'mss': MssSource,
+    'replay': ReplaySource,
+    'synthetic': SyntheticSource,
+}
+
+_source = None
+
+
+def make_source(spec):
+    """Build a source from a spec like 'mss', 'pyautogui', 'synthetic' or 'replay:<path>'"""
+    name, _, arg = spec.partition(':')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown capture backend '{name}' (choose from {', '.join(BACKENDS)})")
+    if arg:
+        return BACKENDS[name](arg)
+    return BACKENDS[name]()
+
+
+def default_source():
+    """Backend from GINGERBREAD_CAPTURE, else mss if installed, else pyautogui"""
+    spec = os.environ.get('GINGERBREAD_CAPTURE')
+    if spec:
+        return make_source(spec)
+    try:
+        return MssSource()
+    except ImportError:
+        return PyAutoGuiSource()
+
+
+def get_source():
+    global _source
+    if _source is None:
+        _source = default_source()
+    return _source
+
+
+def set_source(source):
+    """Swap the capture backend used by every capture site"""
+    global _source
+    if _source is not None and _source is not source:
+        _source.close()
+    _source = source
+    return source
+
+
+def grab(region):
+    return get_source().grab(region)
+
+
+def grab_many(regions):
+    return get_source().grab_many(regions)
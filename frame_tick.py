@@ -0,0 +1,86 @@
+import clock
+import frame_sources
+import stage_metrics
+
+# Regions share one grab only while its box is at most this many times their combined area
+MERGE_SLACK = 1.3
+
+
+def bounding_box(regions):
+    """Smallest (x, y, width, height) covering every region"""
+    x1 = min(r[0] for r in regions)
+    y1 = min(r[1] for r in regions)
+    x2 = max(r[0] + r[2] for r in regions)
+    y2 = max(r[1] + r[3] for r in regions)
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+def grab_boxes(regions, slack=MERGE_SLACK):
+    """Boxes to grab so every region is covered without capturing much dead screen.
+
+    Starts with one box per region and keeps merging any two groups whose
+    common bounding box is at most `slack` times the summed area of their
+    regions. Nearby or nested regions end up in one grab; far-apart ones
+    (pattern vs. the Claim button) are grabbed separately.
+    """
+    groups = [[region] for region in dict.fromkeys(regions)]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(groups)):
+            for j in range(i + 1, len(groups)):
+                members = groups[i] + groups[j]
+                _, _, w, h = bounding_box(members)
+                if w * h <= slack * sum(r[2] * r[3] for r in members):
+                    groups[i] = members
+                    del groups[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [bounding_box(group) for group in groups]
+
+
+class FrameTick:
+    """One set of screen grabs per tick, shared by every region probe.
+
+    `regions` maps a name to an (x, y, width, height) tuple and is read on
+    every grab, so regions can be added or moved after construction.
+    """
+
+    def __init__(self, regions):
+        self.regions = regions
+        self.frames = []  # (box, image) per grab of the last tick
+        self.timestamp = 0.0
+        self.count = 0
+        self.bus = None  # optional FrameBus every grabbed region is published to
+        self.seqs = {}  # region -> bus sequence number of the last grab
+
+    def grab(self, names=None):
+        """Capture the named regions (default: all) once, merging nearby ones into one grab"""
+        if names is None:
+            names = list(self.regions)
+        boxes = grab_boxes([self.regions[name] for name in names])
+        with stage_metrics.timer('capture'):
+            self.frames = list(zip(boxes, frame_sources.grab_many(boxes)))
+        self.timestamp = clock.now()
+        self.count += 1
+        self.seqs = self.bus.publish_tick(self, names) if self.bus is not None else {}
+        return self
+
+    def snapshot(self):
+        """Frozen copy of this tick that later grabs will not overwrite"""
+        tick = FrameTick(dict(self.regions))
+        tick.frames = list(self.frames)
+        tick.timestamp = self.timestamp
+        tick.count = self.count
+        tick.seqs = self.seqs
+        return tick
+
+    def view(self, name):
+        """Zero-copy view of a region inside the last grab"""
+        x, y, w, h = self.regions[name]
+        for (bx, by, bw, bh), frame in self.frames:
+            if bx <= x and by <= y and x + w <= bx + bw and y + h <= by + bh:
+                return frame[y - by:y - by + h, x - bx:x - bx + w]
+        raise ValueError(f"Region '{name}' was not part of the last grab")
@@ -0,0 +1,274 @@
+import argparse
+import random
+import threading
+
+import cv2
+import numpy as np
+
+import clock
+import frame_sources
+import input_dispatch
+import main
+import auto_game_loop
+
+# Colors drawn by the simulator, as HSV picked from inside each detector range
+SIM_HSV = {
+    'green_glaze': (60, 220, 220),
+    'red_glaze': (4, 230, 230),
+    'blue_sprinkles': (105, 200, 200),
+    'grapes': (145, 200, 200),
+    'eyes': (15, 100, 50),
+    'checkmark': (0, 0, 255),
+    'rewards': (60, 200, 200),
+    'blue_bar': (97, 200, 200),
+    'exit': (0, 160, 200),
+}
+
+# Where each element is drawn inside the pattern region: (dx, dy, width, height).
+# Kept left of and below the checkmark region, which sits in the pattern's top-right.
+PATTERN_LAYOUT = {
+    'green_glaze': (10, 80, 40, 40),
+    'red_glaze': (10, 80, 40, 40),
+    'blue_sprinkles': (60, 80, 12, 12),
+    'grapes': (60, 110, 8, 8),
+    'eyes': (90, 80, 10, 10),
+}
+
+BACKGROUND = 128  # neutral gray - no detector class
+
+
+def hsv_to_bgr(hsv):
+    pixel = np.array([[hsv]], dtype=np.uint8)
+    return tuple(int(c) for c in cv2.cvtColor(pixel, cv2.COLOR_HSV2BGR)[0, 0])
+
+
+def random_pattern(rng):
+    """One glaze plus any subset of the toppings"""
+    pattern = {'green_glaze': False, 'red_glaze': False}
+    pattern[rng.choice(['green_glaze', 'red_glaze'])] = True
+    for element in ('blue_sprinkles', 'grapes', 'eyes'):
+        pattern[element] = rng.random() < 0.5
+    return pattern
+
+
+class GameSimulator:
+    """Renders the mini-game at the configured regions and reacts to input.
+
+    States: outside (blue bar shown, tapping or holding 's' walks back) -> countdown -> pattern
+    -> checkmark -> ... -> rewards (Claim) -> exit (Exit) -> outside. All
+    timings are in game seconds from clock.now(), so clock.set_speed()
+    compresses them together with the loop under test.
+    """
+
+    def __init__(self, regions, claim_pos, exit_pos, keybinds, patterns_per_round=20,
+                 countdown=5.0, checkmark_time=0.4, pattern_timeout=3.0, walk_steps=3,
+                 step_time=0.2, exit_delay=0.3, seed=None):
+        self.regions = regions
+        self.claim_pos = claim_pos
+        self.exit_pos = exit_pos
+        self.element_for_key = {key: element for element, key in keybinds.items()}
+        self.patterns_per_round = patterns_per_round
+        self.countdown = countdown
+        self.checkmark_time = checkmark_time
+        self.pattern_timeout = pattern_timeout
+        self.walk_steps = walk_steps
+        self.step_time = step_time  # game seconds of holding 's' worth one tap
+        self.exit_delay = exit_delay
+        self.rng = random.Random(seed)
+        self.colors = {name: hsv_to_bgr(hsv) for name, hsv in SIM_HSV.items()}
+        self.lock = threading.Lock()
+        self.cursor = (0, 0)
+        self.stats = {
+            'rounds': 0, 'patterns': 0, 'solved': 0, 'wrong_keys': 0,
+            'stalls': 0, 'missed_clicks': 0, 'ignored_keys': 0,
+        }
+        self._enter('outside')
+        self.steps = 0
+        self.held_since = None
+
+    def _enter(self, state, duration=None):
+        self.state = state
+        self.state_since = clock.now()
+        self.state_until = None if duration is None else self.state_since + duration
+
+    def _new_pattern(self):
+        self.pattern = random_pattern(self.rng)
+        self.pressed = set()
+        self.failed = False
+        self.stats['patterns'] += 1
+        self._enter('pattern', self.pattern_timeout)
+
+    def _advance(self):
+        """Apply timed transitions - called under the lock before rendering or input"""
+        now = clock.now()
+        if self.state == 'outside' and self.held_since is not None:
+            if self.steps + (now - self.held_since) / self.step_time >= self.walk_steps:
+                self.steps = 0
+                self.held_since = now
+                self._enter('countdown', self.countdown)
+            return
+        if self.state_until is None or now < self.state_until:
+            return
+        if self.state == 'countdown':
+            self.round_patterns = 0
+            self._new_pattern()
+        elif self.state == 'pattern':
+            # Wrong or missing keys - the game moves on without credit
+            self.stats['stalls'] += 1
+            self._finish_pattern()
+        elif self.state == 'checkmark':
+            if self.round_patterns >= self.patterns_per_round:
+                self._enter('rewards')
+            else:
+                self._new_pattern()
+        elif self.state == 'exit_pending':
+            self._enter('exit')
+
+    def _finish_pattern(self):
+        self.round_patterns += 1
+        self._enter('checkmark', self.checkmark_time)
+
+    # -- input sink ------------------------------------------------------
+
+    def key(self, key):
+        with self.lock:
+            self._advance()
+            if self.state == 'outside' and key == 's':
+                self.steps += 1
+                if self.steps >= self.walk_steps:
+                    self.steps = 0
+                    self._enter('countdown', self.countdown)
+                return
+            element = self.element_for_key.get(key)
+            if self.state != 'pattern' or element is None:
+                self.stats['ignored_keys'] += 1
+                return
+            if not self.pattern[element]:
+                self.failed = True
+                self.stats['wrong_keys'] += 1
+                return
+            self.pressed.add(element)
+            required = {e for e, present in self.pattern.items() if present}
+            if self.pressed == required and not self.failed:
+                self.stats['solved'] += 1
+                self._finish_pattern()
+
+    def key_down(self, key):
+        with self.lock:
+            self._advance()
+            if key == 's' and self.held_since is None:
+                self.held_since = clock.now()
+
+    def key_up(self, key):
+        with self.lock:
+            self._advance()
+            if key == 's':
+                self.held_since = None
+
+    def click(self, x, y):
+        with self.lock:
+            self._advance()
+            if self.state == 'rewards' and self._hits(self.regions['rewards'], x, y):
+                self._enter('exit_pending', self.exit_delay)
+            elif self.state == 'exit' and abs(x - self.exit_pos[0]) <= 40 and abs(y - self.exit_pos[1]) <= 20:
+                self.stats['rounds'] += 1
+                self._enter('outside')
+            else:
+                self.stats['missed_clicks'] += 1
+
+    @staticmethod
+    def _hits(region, x, y):
+        rx, ry, rw, rh = region
+        # the real click lands a few px left of the aimed point after the hover wiggle
+        return rx - 10 <= x <= rx + rw and ry <= y <= ry + rh
+
+    # -- renderer --------------------------------------------------------
+
+    def _fill(self, img, region, rect, color):
+        """Fill screen rect (x, y, w, h) clipped to the captured region"""
+        x1 = max(rect[0], region[0])
+        y1 = max(rect[1], region[1])
+        x2 = min(rect[0] + rect[2], region[0] + region[2])
+        y2 = min(rect[1] + rect[3], region[1] + region[3])
+        if x1 < x2 and y1 < y2:
+            img[y1 - region[1]:y2 - region[1], x1 - region[0]:x2 - region[0]] = color
+
+    def render(self, region, t=None):
+        img = np.full((region[3], region[2], 3), BACKGROUND, dtype=np.uint8)
+        with self.lock:
+            self._advance()
+            state = self.state
+            pattern = dict(self.pattern) if state in ('pattern', 'checkmark') else None
+
+        if state == 'outside':
+            self._fill(img, region, self.regions['blue_bar'], self.colors['blue_bar'])
+        if pattern:
+            px, py = self.regions['pattern'][:2]
+            for element, present in pattern.items():
+                if present:
+                    dx, dy, w, h = PATTERN_LAYOUT[element]
+                    self._fill(img, region, (px + dx, py + dy, w, h), self.colors[element])
+        if state == 'checkmark':
+            cx, cy, cw, ch = self.regions['checkmark']
+            self._fill(img, region, (cx + 10, cy + 10, cw - 20, ch - 20), self.colors['checkmark'])
+        if state == 'rewards':
+            self._fill(img, region, self.regions['rewards'], self.colors['rewards'])
+        if state == 'exit':
+            ex, ey = self.exit_pos
+            self._fill(img, region, (ex - 40, ey - 20, 80, 40), self.colors['exit'])
+        return img
+
+
+class SimInput(input_dispatch.RecordingBackend):
+    """Input backend that feeds the simulator instead of the OS"""
+
+    def __init__(self, sim, size=(1920, 1080)):
+        super().__init__(size)
+        self.sim = sim
+
+    def press(self, key):
+        super().press(key)
+        self.sim.key(key)
+
+    def key_down(self, key):
+        super().key_down(key)
+        self.sim.key_down(key)
+
+    def key_up(self, key):
+        super().key_up(key)
+        self.sim.key_up(key)
+
+    def click(self):
+        super().click()
+        self.sim.click(*self.cursor)
+
+
+def simulate(rounds=100, speed=20.0, seed=None, **sim_options):
+    """Push `rounds` rounds through auto_game_loop.auto_loop against the simulator"""
+    sim = GameSimulator(main.TICK.regions, main.BUTTONS['claim'], main.BUTTONS['exit'],
+                        main.KEYBINDS, seed=seed, **sim_options)
+    frame_sources.set_source(frame_sources.SyntheticSource(sim.render))
+    input_dispatch.set_backend(SimInput(sim))
+    clock.set_speed(speed)
+
+    start = clock.now()
+    auto_game_loop.auto_loop(max_rounds=rounds)
+    elapsed = clock.now() - start
+    stats = dict(sim.stats)
+    stats['game_seconds'] = elapsed
+    stats['rounds_per_hour'] = stats['rounds'] / elapsed * 3600 if elapsed > 0 else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run auto_loop against a simulated game")
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--speed', type=float, default=20.0, help="Game seconds per wall second")
+    parser.add_argument('--patterns', type=int, default=20, help="Patterns per round")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    stats = simulate(args.rounds, args.speed, args.seed, patterns_per_round=args.patterns)
+    print("\n=== Simulation ===")
+    for key, value in stats.items():
+        print(f"{key:16} {value:.1f}" if isinstance(value, float) else f"{key:16} {value}")
@@ -1,34 +1,17 @@
 import cv2
 import numpy as np
+import csv
+import glob
 import os
-import pyautogui
 import time
+from concurrent.futures import ProcessPoolExecutor
+import frame_sources
+from detector_config import REGIONS, THRESHOLDS, get_detectors
+from session_recorder import SessionReader
+
+IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg', '*.bmp')
+CHUNK = 256  # session frames classified per vectorized pass
 
-# Color ranges in HSV for detection - PRECISE/SHARP colors only (same as main.py)
-COLOR_RANGES = {
-    'green_glaze': {
-        'lower': np.array([35, 150, 150]),   # Bright lime/neon green
-        'upper': np.array([85, 255, 255])
-    },
-    'red_glaze': {
-        'lower1': np.array([0, 180, 180]),    # Very sharp red/pink only - higher saturation
-        'upper1': np.array([8, 255, 255]),
-        'lower2': np.array([170, 180, 180]),  # Very sharp red/pink only - higher saturation
-        'upper2': np.array([180, 255, 255])
-    },
-    'blue_sprinkles': {
-        'lower': np.array([95, 120, 120]),    # Sharp blue/cyan dots only
-        'upper': np.array([115, 255, 255])
-    },
-    'grapes': {
-        'lower': np.array([135, 100, 100]),   # Sharp purple only
-        'upper': np.array([155, 255, 255])
-    },
-    'eyes': {
-        'lower': np.array([0, 25, 15]),       # Dark brown/chocolate spots
-        'upper': np.array([30, 180, 85])      # Wider range for brown tones
-    }
-}
 
 def generate_masks_from_screenshot(image_path):
     """Generate individual masks from a single screenshot"""
@@ -41,8 +24,10 @@ def generate_masks_from_screenshot(image_path):
         print(f"ERROR: Could not load image from {image_path}")
         return
     
-    # Convert to HSV
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    # Per-pixel class flags from the same compiled table the bot uses
+    detectors = get_detectors()
+    flags = detectors.classifier.flags(img)
+    class_bits = {name: bit for bit, name in enumerate(detectors.classifier.classes)}
     
     # Create Masks folder if it doesn't exist
     if not os.path.exists('Masks'):
@@ -55,17 +40,9 @@ def generate_masks_from_screenshot(image_path):
     
     results = {}
     
-    for element in COLOR_RANGES.keys():
+    for element in detectors.elements:
         # Create mask
-        if element == 'red_glaze':
-            mask1 = cv2.inRange(hsv, COLOR_RANGES[element]['lower1'], 
-                               COLOR_RANGES[element]['upper1'])
-            mask2 = cv2.inRange(hsv, COLOR_RANGES[element]['lower2'], 
-                               COLOR_RANGES[element]['upper2'])
-            mask = cv2.bitwise_or(mask1, mask2)
-        else:
-            mask = cv2.inRange(hsv, COLOR_RANGES[element]['lower'], 
-                              COLOR_RANGES[element]['upper'])
+        mask = ((flags >> class_bits[element]) & 1).astype(np.uint8) * 255
         
         # Count pixels
         pixel_count = cv2.countNonZero(mask)
@@ -92,24 +69,181 @@ def generate_masks_from_screenshot(image_path):
     print("Elements detected in this pattern:")
     for element, count in results.items():
         # Show elements above their actual thresholds
-        thresholds = {
-            'green_glaze': 1000,
-            'red_glaze': 200,
-            'blue_sprinkles': 100,
-            'grapes': 40,
-            'eyes': 60
-        }
-        if count >= thresholds[element]:
+        if count > THRESHOLDS[element]:
             print(f"  ✓ {element} ({count} pixels)")
     
     print("\nAll masks saved in 'Masks' folder!")
     print("  - mask_[element].png for each element")
     print("  - pattern_source.png (original image)")
 
+def class_masks(flags, classes):
+    """{class: 0/255 mask} from a flag image"""
+    return {name: ((flags >> bit) & 1).astype(np.uint8) * 255 for bit, name in enumerate(classes)}
+
+
+def write_masks(masks_dir, stem, img, flags, classes):
+    for name, mask in class_masks(flags, classes).items():
+        cv2.imwrite(os.path.join(masks_dir, f'{stem}_{name}.png'), mask)
+    cv2.imwrite(os.path.join(masks_dir, f'{stem}_source.png'), img)
+
+
+def count_stack(flags, classes):
+    """Per-image class counts for a stacked N x H x W flag array -> N x classes"""
+    return np.stack([np.count_nonzero((flags >> bit) & 1, axis=(1, 2)) for bit in range(len(classes))], axis=1)
+
+
+def session_rows(path, region, masks_dir=None):
+    """Yield (image, region, counts) for a recorded session, classifying CHUNK stacked frames at a time"""
+    reader = SessionReader(path)
+    classifier = get_detectors().classifier
+    classes = list(classifier.classes)
+    region_id = reader.region_names.index(region)
+    selected = np.flatnonzero(reader.index['region'] == region_id)
+    for start in range(0, len(selected), CHUNK):
+        chunk = selected[start:start + CHUNK]
+        # One store per frame size; split where a resize happened mid-session
+        stores = reader.index['store'][chunk]
+        for store in np.unique(stores):
+            ids = chunk[stores == store]
+            stack = reader.stores[store][reader.index['slot'][ids]]
+            flags = classifier.flags(stack)
+            counts = count_stack(flags, classes)
+            for i, frame_id in enumerate(ids):
+                name = f'{frame_id:06d}'
+                if masks_dir:
+                    write_masks(masks_dir, name, stack[i], flags[i], classes)
+                yield name, region, counts[i]
+
+
+def _image_counts(job):
+    """Worker: classify one image file -> (name, counts or None if unreadable)"""
+    file, masks_dir = job
+    img = cv2.imread(file)
+    if img is None:
+        return os.path.basename(file), None
+    classifier = get_detectors().classifier
+    flags = classifier.flags(img)
+    classes = list(classifier.classes)
+    if masks_dir:
+        write_masks(masks_dir, os.path.splitext(os.path.basename(file))[0], img, flags, classes)
+    return os.path.basename(file), count_stack(flags[None], classes)[0]
+
+
+def directory_rows(path, region, masks_dir=None, workers=None):
+    """Yield (image, region, counts) for an image directory, decoding and classifying in a process pool"""
+    files = []
+    for pattern in IMAGE_PATTERNS:
+        files.extend(glob.glob(os.path.join(path, pattern)))
+    jobs = [(file, masks_dir) for file in sorted(files)]
+    if workers == 1:
+        yield from _count_rows(map(_image_counts, jobs), region)
+        return
+    with ProcessPoolExecutor(workers, initializer=get_detectors) as pool:
+        yield from _count_rows(pool.map(_image_counts, jobs, chunksize=32), region)
+
+
+def _count_rows(results, region):
+    for name, counts in results:
+        if counts is None:
+            print(f"Skipping {name}: could not read image")
+            continue
+        yield name, region, counts
+
+
+class StatsWriter:
+    """Stream rows to CSV, or to Parquet (needs pyarrow) when the path ends in .parquet"""
+
+    def __init__(self, path, classes, batch=1024):
+        self.path = path
+        self.classes = classes
+        self.batch = batch
+        self.rows = []
+        self.parquet = path.endswith('.parquet')
+        if self.parquet:
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("Parquet output needs pyarrow (pip install pyarrow) - or use a .csv path")
+            self._pa = pyarrow
+            fields = [('image', pyarrow.string()), ('region', pyarrow.string())]
+            fields += [(name, pyarrow.int64()) for name in classes]
+            self.schema = pyarrow.schema(fields)
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        else:
+            self.file = open(path, 'w', newline='')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(['image', 'region'] + classes)
+
+    def write(self, image, region, counts):
+        self.rows.append([image, region] + [int(c) for c in counts])
+        if len(self.rows) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.parquet:
+            columns = list(zip(*self.rows))
+            self.writer.write_table(self._pa.Table.from_arrays(
+                [self._pa.array(column) for column in columns], schema=self.schema))
+        else:
+            self.writer.writerows(self.rows)
+            self.file.flush()
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.parquet:
+            self.writer.close()
+        else:
+            self.file.close()
+
+
+def generate_masks_batch(source, stats_path='mask_stats.csv', masks_dir=None, region='pattern', workers=None):
+    """Count every class in every capture of a directory or recorded session.
+
+    One row per image is streamed to stats_path (CSV or .parquet); masks are
+    only written when masks_dir is given, one set per image. Returns the
+    counts as an N x classes array for summarising.
+    """
+    classes = list(get_detectors().classifier.classes)
+    if masks_dir:
+        os.makedirs(masks_dir, exist_ok=True)
+    if os.path.exists(os.path.join(source, 'meta.json')):
+        rows = session_rows(source, region, masks_dir)
+    else:
+        rows = directory_rows(source, region, masks_dir, workers)
+
+    writer = StatsWriter(stats_path, classes)
+    collected = []
+    try:
+        for image, row_region, counts in rows:
+            writer.write(image, row_region, counts)
+            collected.append(counts)
+    finally:
+        writer.close()
+    return np.array(collected).reshape(-1, len(classes))
+
+
+def print_batch_summary(counts, classes):
+    """Per-element count distribution next to its threshold"""
+    print(f"\n{len(counts)} images")
+    print(f"{'element':16} {'threshold':>9} {'above':>7} {'min':>7} {'p5':>7} {'median':>7} {'p95':>7} {'max':>7}")
+    for i, name in enumerate(classes):
+        if name not in THRESHOLDS or not len(counts):
+            continue
+        column = counts[:, i]
+        p5, median, p95 = np.percentile(column, [5, 50, 95])
+        above = int(np.count_nonzero(column > THRESHOLDS[name]))
+        print(f"{name:16} {THRESHOLDS[name]:9} {above:7} {column.min():7} {p5:7.0f} {median:7.0f} {p95:7.0f} {column.max():7}")
+
+
 if __name__ == "__main__":
     print("=== Generate Masks from Screenshot ===\n")
     
-    print("1. Capture from screen (coordinates: 1652, 175 to 1876, 392)")
+    x, y, w, h = REGIONS['pattern']
+    print(f"1. Capture from screen (coordinates: {x}, {y} to {x + w}, {y + h})")
     print("2. Load from existing image file")
     
     choice = input("\nChoose option (1 or 2): ")
@@ -119,15 +253,8 @@ if __name__ == "__main__":
         print("\nCapturing pattern region in 5 seconds... Alt-tab to game!")
         time.sleep(1)
         
-        # Calculate region (x, y, width, height)
-        # Top-left (1652, 175) to Bottom-right (1876, 392)
-        x1, y1 = 1652, 188
-        x2, y2 = 1856, 390
-        region = (x1, y1, x2-x1, y2-y1)  # (1652, 175, 224, 217)
-        
-        # Capture screenshot
-        screenshot = pyautogui.screenshot(region=region)
-        img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+        # Capture screenshot of the configured pattern region
+        img = frame_sources.grab(REGIONS['pattern'])
         
         # Save the captured image
         cv2.imwrite('captured_pattern.png', img)
@@ -0,0 +1,227 @@
+"""Command-line entry point for every Gingerbread tool.
+
+Only argparse is imported up front; each subcommand imports what it needs,
+so offline tools never load pyautogui/pydirectinput/mss and start with just
+the numpy + cv2 import cost. --headless swaps in a synthetic (or --replay)
+capture source and a recording input backend, so nothing touches a display.
+
+    python gingerbread.py run [--record DIR] [--metrics FILE] [--bus]
+    python gingerbread.py loop [--rounds N] [--profiles FILE]
+    python gingerbread.py test-detect
+    python gingerbread.py calibrate {region,rewards,claim,anchor}
+    python gingerbread.py gen-masks [IMAGE | DIR | SESSION]
+    python gingerbread.py watch-checkmark
+    python gingerbread.py bench SOURCE [--strides 1,2,3,4]
+    python gingerbread.py build-probes SOURCE
+    python gingerbread.py simulate [--rounds N] [--speed X]
+"""
+import argparse
+import os
+import sys
+
+
+def setup_backends(args):
+    """Apply --capture/--headless/--replay before any capture or input happens"""
+    if args.log_level:
+        from event_log import LOG
+        LOG.set_level(args.log_level)
+    if not (args.capture or args.headless or args.replay):
+        return
+    import frame_sources
+    if args.replay:
+        frame_sources.set_source(frame_sources.ReplaySource(args.replay))
+    elif args.capture:
+        frame_sources.set_source(frame_sources.make_source(args.capture))
+    elif args.headless:
+        frame_sources.set_source(frame_sources.SyntheticSource())
+    if args.headless:
+        import input_dispatch
+        input_dispatch.set_backend(input_dispatch.RecordingBackend())
+
+
+def cmd_run(args):
+    import main
+    main.run_automation(record=args.record, metrics=args.metrics, bus=args.bus)
+
+
+def cmd_loop(args):
+    if args.profiles:
+        import multi_client
+        try:
+            multi_client.run_clients(multi_client.load_profiles(args.profiles), args.rounds,
+                                     fps=args.fps, headless=args.headless, log_level=args.log_level)
+        except RuntimeError as e:
+            raise SystemExit(f"{e}: {e.__cause__}")
+        return
+    import auto_game_loop
+    auto_game_loop.auto_loop(max_rounds=args.rounds, record=args.record, metrics=args.metrics, bus=args.bus)
+
+
+def cmd_test_detect(args):
+    import main
+    main.test_detection()
+
+
+CALIBRATION_SCRIPTS = {
+    'region': 'get_region_coordinates.py',
+    'rewards': 'get_rewards_region.py',
+    'claim': 'get_claim_button_region.py',
+}
+
+
+def cmd_calibrate(args):
+    if args.target == 'anchor':
+        if args.region is None:
+            # The pattern/checkmark regions change all the time - the anchor must be UI that never does
+            raise SystemExit("calibrate anchor needs --region X Y W H around a static piece of the game UI")
+        import main
+        region = tuple(args.region)
+        print(f"Capturing anchor {region} in 3 seconds... Alt-tab to game!")
+        main.clock.sleep(3)
+        main.REGISTRY.capture_anchor(region)
+        print(f"Saved {main.REGISTRY.anchor_path} - regions will be fitted to other screens from it")
+        return
+    run_script(CALIBRATION_SCRIPTS[args.target])
+
+
+def cmd_gen_masks(args):
+    import generate_masks_from_image
+    if args.image and os.path.isdir(args.image):
+        classes = list(generate_masks_from_image.get_detectors().classifier.classes)
+        counts = generate_masks_from_image.generate_masks_batch(
+            args.image, args.stats, args.masks, args.region, args.workers)
+        generate_masks_from_image.print_batch_summary(counts, classes)
+        print(f"Per-image counts written to {args.stats}")
+    elif args.image:
+        generate_masks_from_image.generate_masks_from_screenshot(args.image)
+    else:
+        run_script('generate_masks_from_image.py')
+
+
+def cmd_watch_checkmark(args):
+    import detect_checkmark
+    detect_checkmark.run_detection()
+
+
+def cmd_bench(args):
+    import bench_detection
+    frames = bench_detection.load_frames(args.source, args.labels)
+    print(f"Loaded {len(frames)} frames from {args.source}")
+    bench_detection.print_report(bench_detection.run_benchmark(frames, args.repeat))
+    if args.strides:
+        bench_detection.print_stride_report(bench_detection.stride_report(
+            frames, bench_detection.parse_strides(args.strides), args.repeat))
+
+
+def cmd_build_probes(args):
+    import bench_detection
+    import sparse_probe
+    from detector_config import PROBE_FILE, STATE_REGIONS, get_detectors
+    frames = bench_detection.load_frames(args.source, args.labels)
+    probes, skipped = sparse_probe.build_probes(frames, get_detectors().classifier, STATE_REGIONS, size=args.size)
+    for state, probe in probes.items():
+        print(f"{state:16} {len(probe.points)} probe pixels in '{probe.region}'")
+    for state, reason in skipped.items():
+        print(f"{state:16} skipped: {reason}")
+    if probes:
+        output = args.output or PROBE_FILE
+        existing = sparse_probe.load_probes(output)
+        existing.update(probes)
+        sparse_probe.save_probes(existing, output)
+        print(f"Wrote {output}")
+
+
+def cmd_simulate(args):
+    import game_simulator
+    stats = game_simulator.simulate(args.rounds, args.speed, args.seed, patterns_per_round=args.patterns)
+    print("\n=== Simulation ===")
+    for key, value in stats.items():
+        print(f"{key:16} {value:.1f}" if isinstance(value, float) else f"{key:16} {value}")
+
+
+def run_script(filename):
+    """Run one of the interactive scripts next to this file as __main__"""
+    import runpy
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), filename), run_name='__main__')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='gingerbread', description="Gingerbread Bakery macro tools")
+    parser.add_argument('--capture', help="Capture backend: mss, pyautogui, synthetic or replay:<path>")
+    parser.add_argument('--replay', help="Replay screenshots/video from this path instead of the screen")
+    parser.add_argument('--headless', action='store_true',
+                        help="No display or input: synthetic (or --replay) frames, recorded input")
+    parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error', 'off'])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help="Solve patterns until the rewards screen, then claim")
+    p.add_argument('--record', help="Record frames to this session directory")
+    p.add_argument('--metrics', help="Export stage metrics to this .json/.prom file")
+    p.add_argument('--bus', action='store_true', help="Publish frames to shared memory for test-detect/watch-checkmark")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser('loop', help="Walk in, play, claim - round after round")
+    p.add_argument('--rounds', type=int, help="Stop after this many rounds (default: forever)")
+    p.add_argument('--record', help="Record frames to this session directory")
+    p.add_argument('--metrics', help="Export stage metrics to this .json/.prom file")
+    p.add_argument('--bus', action='store_true', help="Publish frames to shared memory for test-detect/watch-checkmark")
+    p.add_argument('--profiles', help="JSON list of client profiles - one worker process per client")
+    p.add_argument('--fps', type=float, default=30.0, help="Shared capture rate with --profiles")
+    p.set_defaults(func=cmd_loop)
+
+    p = sub.add_parser('test-detect', help="Capture the pattern once and print what is detected")
+    p.set_defaults(func=cmd_test_detect)
+
+    p = sub.add_parser('calibrate', help="Read region/button coordinates from the mouse, or capture the anchor")
+    p.add_argument('target', choices=sorted(CALIBRATION_SCRIPTS) + ['anchor'])
+    p.add_argument('--region', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'),
+                   help="anchor (required): static UI rectangle in the configured layout")
+    p.set_defaults(func=cmd_calibrate)
+
+    p = sub.add_parser('gen-masks', help="Write per-element masks for a pattern image")
+    p.add_argument('image', nargs='?', help="Image to analyse, or a directory/recorded session for batch mode "
+                                            "(default: interactive)")
+    p.add_argument('--stats', default='mask_stats.csv', help="Batch mode: per-image counts (.csv or .parquet)")
+    p.add_argument('--masks', help="Batch mode: also write per-image masks to this directory")
+    p.add_argument('--region', default='pattern', help="Batch mode: session region to analyse")
+    p.add_argument('--workers', type=int, help="Batch mode: processes for image directories (default: all cores)")
+    p.set_defaults(func=cmd_gen_masks)
+
+    p = sub.add_parser('watch-checkmark', help="Log checkmark appear/disappear transitions")
+    p.set_defaults(func=cmd_watch_checkmark)
+
+    p = sub.add_parser('bench', help="Replay recorded frames through every detector")
+    p.add_argument('source', help="Directory of ROI PNGs or a recorded session")
+    p.add_argument('--labels', help="JSON of expected results per PNG")
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--strides', help="Also compare pattern count strides, e.g. 1,2,3,4")
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser('build-probes', help="Build sparse pixel probes for the UI states from labelled captures")
+    p.add_argument('source', help="Recorded session or directory of ROI PNGs")
+    p.add_argument('--labels', help="JSON of expected results per PNG")
+    p.add_argument('--size', type=int, default=32, help="Probe pixels per state")
+    p.add_argument('--output', help="Probe file (default: probes.json next to the scripts)")
+    p.set_defaults(func=cmd_build_probes)
+
+    p = sub.add_parser('simulate', help="Run the loop against the built-in game simulator")
+    p.add_argument('--rounds', type=int, default=10)
+    p.add_argument('--speed', type=float, default=20.0)
+    p.add_argument('--patterns', type=int, default=20)
+    p.add_argument('--seed', type=int)
+    p.set_defaults(func=cmd_simulate)
+    return parser
+
+
+def cli(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_backends(args)
+    try:
+        args.func(args)
+    except KeyboardInterrupt:
+        print("\nStopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,153 @@
+import contextlib
+
+import clock
+
+
+class InputBackend:
+    """Where key and mouse events go"""
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def key_down(self, key):
+        raise NotImplementedError
+
+    def key_up(self, key):
+        raise NotImplementedError
+
+    def move(self, x, y):
+        raise NotImplementedError
+
+    def move_rel(self, dx, dy):
+        raise NotImplementedError
+
+    def click(self):
+        raise NotImplementedError
+
+    def screen_size(self):
+        raise NotImplementedError
+
+    def batch(self):
+        """Context held around one dispatch() batch - backends shared between
+        processes use it to keep a batch from interleaving with another's"""
+        return contextlib.nullcontext()
+
+
+class DirectInputBackend(InputBackend):
+    """Real injection through pydirectinput.
+
+    pydirectinput sleeps PAUSE (0.1 s) after every call by default; every
+    call here passes _pause=False so spacing is only what the dispatcher asks for.
+    """
+
+    def __init__(self):
+        import pydirectinput
+        self._input = pydirectinput
+
+    def press(self, key):
+        self._input.press(key, _pause=False)
+
+    def key_down(self, key):
+        self._input.keyDown(key, _pause=False)
+
+    def key_up(self, key):
+        self._input.keyUp(key, _pause=False)
+
+    def move(self, x, y):
+        self._input.moveTo(x, y, _pause=False)
+
+    def move_rel(self, dx, dy):
+        self._input.moveRel(dx, dy, _pause=False)
+
+    def click(self):
+        self._input.click(_pause=False)
+
+    def screen_size(self):
+        import pyautogui
+        return tuple(pyautogui.size())
+
+
+class RecordingBackend(InputBackend):
+    """Records events instead of sending them - for tests and offline runs"""
+
+    def __init__(self, size=(1920, 1080)):
+        self.size = size
+        self.events = []
+        self.cursor = (0, 0)
+
+    def _record(self, action, *args):
+        self.events.append((clock.now(), action) + args)
+
+    def press(self, key):
+        self._record('press', key)
+
+    def key_down(self, key):
+        self._record('key_down', key)
+
+    def key_up(self, key):
+        self._record('key_up', key)
+
+    def move(self, x, y):
+        self.cursor = (x, y)
+        self._record('move', x, y)
+
+    def move_rel(self, dx, dy):
+        self.cursor = (self.cursor[0] + dx, self.cursor[1] + dy)
+        self._record('move_rel', dx, dy)
+
+    def click(self):
+        self._record('click', *self.cursor)
+
+    def screen_size(self):
+        return self.size
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = DirectInputBackend()
+    return _backend
+
+
+def set_backend(backend):
+    """Swap where every dispatched event goes"""
+    global _backend
+    _backend = backend
+    return backend
+
+
+def key_batch(keys):
+    return [('press', key) for key in keys]
+
+
+def click_batch(x, y, wiggle=True):
+    """Move, optionally nudge left 5px to trigger hover detection, then click"""
+    actions = [('move', x, y)]
+    if wiggle:
+        actions.append(('move_rel', -5, 0))
+    actions.append(('click',))
+    return actions
+
+
+def dispatch(actions, spacing=None):
+    """Send a batch of (action, *args) events in order.
+
+    spacing maps an action name to the delay waited after that kind of
+    event, the last one included, so the game has registered the batch
+    before the caller moves on. Returns the clock.now() stamp at which each
+    event was sent.
+    """
+    backend = get_backend()
+    spacing = spacing or {}
+    stamps = []
+    with backend.batch():
+        for action, *args in actions:
+            getattr(backend, action)(*args)
+            stamps.append(clock.now())
+            gap = spacing.get(action, 0)
+            if gap > 0:
+                clock.sleep(gap)
+    return stamps
@@ -1,210 +1,294 @@
 import cv2
 import numpy as np
-import pyautogui
-import pydirectinput
-import time
+import os
 import random
 from collections import defaultdict
+import clock
+from frame_tick import FrameTick
+from detector_config import REGIONS, BUTTONS, KEYBINDS, THRESHOLDS, STATE_THRESHOLDS, ROUND_THRESHOLDS, STATE_REGIONS, ANCHOR_FILE, CACHE_DIR, config_hash, get_detectors
+from screen_watcher import ScreenWatcher
+from pattern_pipeline import PatternPipeline
+from pattern_settle import SettleDetector, thumbnail_digest
+from pattern_cache import PatternCache
+from region_registry import RegionRegistry
+from session_recorder import SessionRecorder
+from frame_bus import FrameBus, DEFAULT_NAME as BUS_NAME
+import stage_metrics
+from stage_metrics import METRICS, MetricsExporter, timed
+from event_log import LOG
+from input_dispatch import dispatch, get_backend, key_batch, click_batch
 
-# Configuration - Coordinates: Top-left (1652, 188) to Bottom-right (1856, 390)
-PATTERN_REGION = (1652, 188, 204, 202)  # (x, y, width, height)
-CHECKMARK_REGION = (1785, 191, 63, 65)  # (x, y, width, height)
-REWARDS_SCREEN_REGION = (875, 653, 172, 51)  # Claim button region
-CLAIM_BUTTON_POS = (961, 678)  # Center of Claim button region
-EXIT_BUTTON_POS = (956, 822)  # Center of Exit button
-
-# Keybinds
-KEYBINDS = {
-    'green_glaze': 'q',
-    'red_glaze': 'e',
-    'blue_sprinkles': 'a',
-    'grapes': 's',
-    'eyes': 'd'
+# Pattern is read once this many consecutive frames agree (or the deadline passes)
+PATTERN_SETTLE = {
+    'frames': 3,
+    'deadline': 0.25,  # seconds - never wait longer than this for the pattern
+    'tolerance': 6     # max per-pixel difference between 12x12 thumbnails
 }
 
-# Color ranges in HSV for detection - PRECISE/SHARP colors only
-COLOR_RANGES = {
-    'green_glaze': {
-        'lower': np.array([35, 150, 150]),   # Bright lime/neon green
-        'upper': np.array([85, 255, 255])
-    },
-    'red_glaze': {
-        'lower1': np.array([0, 180, 180]),    # Very sharp red/pink only - higher saturation
-        'upper1': np.array([8, 255, 255]),
-        'lower2': np.array([170, 180, 180]),  # Very sharp red/pink only - higher saturation
-        'upper2': np.array([180, 255, 255])
-    },
-    'blue_sprinkles': {
-        'lower': np.array([95, 120, 120]),    # Sharp blue/cyan dots only
-        'upper': np.array([115, 255, 255])
-    },
-    'grapes': {
-        'lower': np.array([135, 100, 100]),   # Sharp purple only
-        'upper': np.array([155, 255, 255])
-    },
-    'eyes': {
-        'lower': np.array([0, 25, 15]),       # Dark brown/chocolate spots
-        'upper': np.array([30, 180, 85])      # Wider range for brown tones
-    }
+# Settled pattern frames -> detected elements, keyed by a perceptual hash
+PATTERN_CACHE = {
+    'capacity': 64,  # patterns kept (least recently used dropped first)
+    'size': 16,      # thumbnail edge the key is computed from
+    'shift': 3,      # drop this many low bits per channel before hashing
+    'persist': True  # keep the cache on disk between runs
 }
+PATTERN_CACHE_FILE = os.path.join(CACHE_DIR, 'patterns.json')
 
-# Thresholds (minimum pixel count to consider element present)
-THRESHOLDS = {
-    'green_glaze': 1000,   # Needs substantial green
-    'red_glaze': 200,      # Based on actual detection (was 1000, saw 288)
-    'blue_sprinkles': 100,
-    'grapes': 40,          # Based on actual detection (was 200, saw 52)
-    'eyes': 60             # Lowered slightly to catch smaller eye spots
+# Reward claim - every step waits for the screen to change instead of sleeping
+CLAIM = {
+    'settle_frames': 2,   # Claim button must look the same this many frames before clicking
+    'step_timeout': 2.0,  # seconds to wait for each screen change before retrying/moving on
+    'retries': 3,         # clicks per button before giving up
+    'change': 40,         # thumbnail difference that counts as the Exit button appearing/leaving
+    'poll': 0.02
 }
 
-# Checkmark detection
-CHECKMARK_WHITE = {
-    'lower': np.array([0, 0, 200]),
-    'upper': np.array([180, 30, 255])
+# Detections within `band` (fraction of the threshold) of a threshold are unsure;
+# up to `extra_frames` more pattern frames are grabbed and averaged before acting
+CONFIDENCE = {
+    'band': 0.25,
+    'extra_frames': 2,
+    'interval': 0.017  # seconds between re-captures - about one display refresh, so each is a new frame
 }
-WHITE_THRESHOLD = 50
 
-# Rewards screen detection (green Claim button)
-REWARDS_GREEN = {
-    'lower': np.array([40, 100, 100]),
-    'upper': np.array([80, 255, 255])
+# Pattern counting on every `stride`-th pixel; elements whose scaled estimate lands
+# within `band` of their threshold are recounted at full resolution (stride 1 = off).
+# Pick the stride from `gingerbread.py bench SESSION --strides 1,2,3,4`.
+FAST_COUNT = {
+    'stride': 2,
+    'band': 0.35
 }
-REWARDS_THRESHOLD = 500  # Large green button
+FAST_COUNT_STATS = {'coarse': 0, 'escalated': 0}
+
+# Input spacing - seconds waited after each kind of event, including the last
+# one of a batch. pydirectinput's hidden 0.1 s PAUSE is disabled, so these are
+# the only delays; the defaults reproduce the original timing (explicit sleep +
+# PAUSE). Lower them only after measuring what the game still registers.
+INPUT_SPACING = {
+    'press': 0.12,     # Between keypresses (0.02 + PAUSE)
+    'move': 0.3,       # Let the cursor land before the hover wiggle / click (0.2 + PAUSE)
+    'move_rel': 0.2,   # Hover wiggle before clicking (0.1 + PAUSE)
+    'click': 0.2       # After the click (0.1 + PAUSE)
+}
+
+# Compiled detector tables (cached on disk) - one lookup table classifies
+# every detector color in a single pass
+DETECTORS = get_detectors()
+CLASSIFIER = DETECTORS.classifier
+
+# Survives across rounds; loaded from / saved to disk by load/save_pattern_cache
+CACHE = PatternCache(PATTERN_CACHE['capacity'], PATTERN_CACHE['size'], PATTERN_CACHE['shift'])
+
+# Fits REGIONS/BUTTONS/thresholds to the current screen from the anchor capture
+REGISTRY = RegionRegistry(REGIONS, BUTTONS, (THRESHOLDS, STATE_THRESHOLDS, ROUND_THRESHOLDS), ANCHOR_FILE,
+                          os.path.join(CACHE_DIR, 'layout.json'))
+
+# Shared per-tick screen grab - probes read views of one capture
+TICK = FrameTick(REGIONS)
+
+# Extra pattern grabs from the detect stage, kept off TICK (owned by the capture stage)
+RECAPTURE = FrameTick(REGIONS)
+
+# Checkmark/rewards transitions as events, polled fast right after a keypress.
+# Own tick - the pipeline's capture stage keeps TICK
+WATCHER = ScreenWatcher(FrameTick(REGIONS), {
+    'checkmark': ('checkmark', lambda img, seq: is_checkmark_present(img, seq), 'checkmark_appeared', 'checkmark_cleared'),
+    'rewards': ('rewards', lambda img, seq: is_rewards_screen(img, seq), 'rewards_shown', None)
+})
 
 
 def capture_pattern():
     """Capture the pattern region from screen"""
-    screenshot = pyautogui.screenshot(region=PATTERN_REGION)
-    img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    return img
+    return TICK.grab(['pattern']).view('pattern')
 
 
-def capture_checkmark():
-    screenshot = pyautogui.screenshot(region=CHECKMARK_REGION)
-    img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    return img
+def publish_counts(region, seq, counts):
+    """Share counts with side tools when the bus is on; `seq` is the bus frame they were computed from"""
+    if seq is not None and TICK.bus is not None:
+        TICK.bus.set_counts(region, seq, counts)
 
 
-def is_checkmark_present():
-    img = capture_checkmark()
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    mask_white = cv2.inRange(hsv, CHECKMARK_WHITE['lower'], CHECKMARK_WHITE['upper'])
-    white_pixels = cv2.countNonZero(mask_white)
-    return white_pixels > WHITE_THRESHOLD
+def count_region(region, img, seq=None):
+    """Class counts for a region frame, attached to bus frame `seq` if it was published"""
+    counts = DETECTORS.count(img)
+    publish_counts(region, seq, counts)
+    return counts
 
 
-def wait_for_checkmark_cycle():
-    """Wait for checkmark to appear then disappear"""
-    # Wait for checkmark to appear (pattern completed)
-    while not is_checkmark_present():
-        if is_rewards_screen():
-            return False  # Signal that rewards screen appeared
-        time.sleep(0.05)
-    
-    # Wait for checkmark to disappear (new pattern ready)
-    while is_checkmark_present():
-        if is_rewards_screen():
-            return False  # Signal that rewards screen appeared
-        time.sleep(0.05)
-    
-    return True  # Normal cycle completed
+def state_present(state, img, seq=None):
+    """Binary UI state from its sparse probe, or the full region count when the probe can't tell"""
+    present = DETECTORS.probe(state, img)
+    if present is None:
+        present = count_region(STATE_REGIONS[state], img, seq)[state] > STATE_THRESHOLDS[state]
+    return present
+
 
+def is_checkmark_present(img=None, seq=None):
+    if img is None:
+        tick = TICK.grab(['checkmark'])
+        img, seq = tick.view('checkmark'), tick.seqs.get('checkmark')
+    return state_present('checkmark_white', img, seq)
 
-def is_rewards_screen():
-    screenshot = pyautogui.screenshot(region=REWARDS_SCREEN_REGION)
-    img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    mask_green = cv2.inRange(hsv, REWARDS_GREEN['lower'], REWARDS_GREEN['upper'])
-    green_pixels = cv2.countNonZero(mask_green)
-    return green_pixels > REWARDS_THRESHOLD
+
+def is_rewards_screen(img=None, seq=None):
+    if img is None:
+        tick = TICK.grab(['rewards'])
+        img, seq = tick.view('rewards'), tick.seqs.get('rewards')
+    return state_present('rewards_green', img, seq)
 
 
 def move_and_click(x, y, wiggle=True):
     """Move to position with optional wiggle, then click"""
-    # Move to target
-    pydirectinput.moveTo(x, y)
-    time.sleep(0.2)
-    
-    # Wiggle left-right to trigger hover detection
-    if wiggle:
-        pydirectinput.moveRel(-5, 0)  # Move left 5px
-        time.sleep(0.1)
-    
-    # Click
-    pydirectinput.click()
-    time.sleep(0.1)
+    return dispatch(click_batch(x, y, wiggle), INPUT_SPACING)
 
 def randomize_cursor():
     """Move cursor to random position on screen"""
-    screen_width, screen_height = pyautogui.size()
+    screen_width, screen_height = get_backend().screen_size()
     rand_x = random.randint(100, screen_width - 100)
     rand_y = random.randint(100, screen_height - 100)
-    pydirectinput.moveTo(rand_x, rand_y)
+    dispatch([('move', rand_x, rand_y)])
+
+def wait_until(check, timeout, poll=CLAIM['poll']):
+    """Poll check() until it returns something other than None/False; None after `timeout` seconds"""
+    deadline = clock.now() + timeout
+    while True:
+        result = check()
+        if result is not None and result is not False:
+            return result
+        if clock.now() >= deadline:
+            return None
+        clock.sleep(poll)
+
 
+def grab_region(name):
+    return TICK.grab([name]).view(name)
+
+
+def click_until(name, pos, done):
+    """Click `pos` until done() reports the click took effect, up to CLAIM['retries'] times"""
+    for attempt in range(1, CLAIM['retries'] + 1):
+        move_and_click(*pos, wiggle=True)
+        if wait_until(done, CLAIM['step_timeout']) is not None:
+            return True
+        LOG.warning('click_retry', "  {button} click had no effect (attempt {attempt})", button=name, attempt=attempt)
+    return False
+
+
+@timed('reward_claim')
 def claim_rewards():
-    print("\n" + "="*50)
-    print("REWARDS SCREEN DETECTED!")
-    print("Waiting 1 second...")
-    time.sleep(1)
-    print("Claiming rewards...")
-    
-    move_and_click(CLAIM_BUTTON_POS[0], CLAIM_BUTTON_POS[1], wiggle=True)
-    
-    time.sleep(1)
-    print("✓ Rewards claimed!")
-    print("Clicking Exit...")
-    
-    move_and_click(EXIT_BUTTON_POS[0], EXIT_BUTTON_POS[1], wiggle=True)
-    
-    time.sleep(0.5)
-    print("✓ Exit clicked!")
-    
+    """Claim -> Exit, each click sent as soon as its button is up and confirmed by the screen changing"""
+    LOG.info('rewards_detected', "\n" + "="*50 + "\nREWARDS SCREEN DETECTED!")
+    exit_idle = thumbnail_digest(grab_region('exit'))
+
+    # Claim is interactive once the button has stopped animating in
+    settle = SettleDetector(CLAIM['settle_frames'], CLAIM['step_timeout'])
+
+    def claim_ready():
+        img = grab_region('rewards')
+        return is_rewards_screen(img) and settle.feed(img) is not None
+
+    if wait_until(claim_ready, CLAIM['step_timeout']) is None:
+        LOG.warning('claim_not_ready', "  Claim button not settled - clicking anyway")
+    LOG.info('claim_click', "Claiming rewards...")
+    if not click_until('Claim', BUTTONS['claim'], lambda: not is_rewards_screen()):
+        LOG.warning('claim_failed', "  Claim button still shown after {retries} clicks", retries=CLAIM['retries'])
+
+    # Exit button: its region changes from how it looked before the claim, then holds still
+    exit_settle = SettleDetector(CLAIM['settle_frames'], CLAIM['step_timeout'])
+
+    def exit_shown():
+        img = grab_region('exit')
+        sig = thumbnail_digest(img)
+        if np.abs(sig - exit_idle).max() <= CLAIM['change']:
+            exit_settle.reset()
+            return None
+        return sig if exit_settle.feed(img) is not None else None
+
+    exit_sig = wait_until(exit_shown, CLAIM['step_timeout'])
+    if exit_sig is None:
+        LOG.warning('exit_not_seen', "  Exit button not detected - clicking anyway")
+        exit_sig = thumbnail_digest(grab_region('exit'))
+    LOG.info('exit_click', "✓ Rewards claimed!\nClicking Exit...")
+
+    # Round is over once the Exit button is gone again
+    def exit_gone():
+        return bool(np.abs(thumbnail_digest(grab_region('exit')) - exit_sig).max() > CLAIM['change'])
+
+    if click_until('Exit', BUTTONS['exit'], exit_gone):
+        LOG.info('exit_clicked', "✓ Exit clicked!")
+    else:
+        LOG.warning('exit_failed', "  Rewards screen still up after {retries} Exit clicks", retries=CLAIM['retries'])
+
     # Randomize cursor position
     randomize_cursor()
-    print("✓ Cursor randomized!")
-    print("="*50)
+    LOG.info('claim_done', "✓ Cursor randomized!\n" + "="*50)
+
+
+def element_confidence(counts, band=None):
+    """0..1 confidence per decision: 0 at the threshold, 1 once `band` (default CONFIDENCE['band']) away from it.
+
+    'glaze' scores the red/green choice - how far apart the two counts are
+    when both pass, and how far both are below their thresholds when the
+    green fallback applies.
+    """
+    band = CONFIDENCE['band'] if band is None else band
+    confidence = {element: min(1.0, abs(counts[element] - threshold) / (threshold * band))
+                  for element, threshold in THRESHOLDS.items()}
+    red, green = counts['red_glaze'], counts['green_glaze']
+    red_on, green_on = red > THRESHOLDS['red_glaze'], green > THRESHOLDS['green_glaze']
+    if red_on and green_on:
+        confidence['glaze'] = min(1.0, abs(green - red) / (max(green, red) * band))
+    elif red_on or green_on:
+        confidence['glaze'] = 1.0
+    else:
+        confidence['glaze'] = min(confidence['red_glaze'], confidence['green_glaze'])
+    return confidence
+
+
+def count_pattern(img, stride=None, seq=None):
+    """Element counts for a pattern frame: a strided estimate, exact only where it matters.
+
+    Every stride-th pixel is classified and scaled by stride squared. Elements
+    clear of their threshold by FAST_COUNT['band'] keep that estimate;
+    the rest (and both glazes when the glaze choice is close) are recounted
+    at full resolution.
+    """
+    stride = FAST_COUNT['stride'] if stride is None else stride
+    if stride <= 1:
+        return count_region('pattern', img, seq)
+    area = stride * stride
+    counts = {name: n * area for name, n in DETECTORS.count(img[::stride, ::stride]).items()}
+    confidence = element_confidence(counts, FAST_COUNT['band'])
+    near = [element for element in THRESHOLDS if confidence[element] < 1.0]
+    if confidence['glaze'] < 1.0:
+        near += [glaze for glaze in ('red_glaze', 'green_glaze') if glaze not in near]
+    FAST_COUNT_STATS['coarse'] += 1
+    if near:
+        FAST_COUNT_STATS['escalated'] += 1
+        counts.update(DETECTORS.count(img, near))
+    publish_counts('pattern', seq, counts)
+    return counts
 
 
-def detect_elements(img):
+def detect_elements(img, verbose=True, stride=None):
     """Detect which elements are present in the image"""
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    detected = {}
-    
-    # Green Glaze
-    mask_green = cv2.inRange(hsv, COLOR_RANGES['green_glaze']['lower'], 
-                             COLOR_RANGES['green_glaze']['upper'])
-    green_pixels = cv2.countNonZero(mask_green)
-    detected['green_glaze'] = green_pixels > THRESHOLDS['green_glaze']
-    
-    # Red Glaze (handle HSV wraparound)
-    mask_red1 = cv2.inRange(hsv, COLOR_RANGES['red_glaze']['lower1'], 
-                            COLOR_RANGES['red_glaze']['upper1'])
-    mask_red2 = cv2.inRange(hsv, COLOR_RANGES['red_glaze']['lower2'], 
-                            COLOR_RANGES['red_glaze']['upper2'])
-    mask_red = cv2.bitwise_or(mask_red1, mask_red2)
-    red_pixels = cv2.countNonZero(mask_red)
-    detected['red_glaze'] = red_pixels > THRESHOLDS['red_glaze']
-    
-    # Blue Sprinkles
-    mask_blue = cv2.inRange(hsv, COLOR_RANGES['blue_sprinkles']['lower'], 
-                            COLOR_RANGES['blue_sprinkles']['upper'])
-    blue_pixels = cv2.countNonZero(mask_blue)
-    detected['blue_sprinkles'] = blue_pixels > THRESHOLDS['blue_sprinkles']
-    
-    # Grapes
-    mask_grapes = cv2.inRange(hsv, COLOR_RANGES['grapes']['lower'], 
-                              COLOR_RANGES['grapes']['upper'])
-    grape_pixels = cv2.countNonZero(mask_grapes)
-    detected['grapes'] = grape_pixels > THRESHOLDS['grapes']
+    return decide_elements(count_pattern(img, stride), verbose)
+
+
+def decide_elements(counts, verbose=True):
+    """Detected elements from per-element pixel counts"""
+    detected = {element: counts[element] > THRESHOLDS[element] for element in THRESHOLDS}
     
-    # Eyes
-    mask_eyes = cv2.inRange(hsv, COLOR_RANGES['eyes']['lower'], 
-                            COLOR_RANGES['eyes']['upper'])
-    eye_pixels = cv2.countNonZero(mask_eyes)
-    detected['eyes'] = eye_pixels > THRESHOLDS['eyes']
+    red_pixels = counts['red_glaze']
+    green_pixels = counts['green_glaze']
+    blue_pixels = counts['blue_sprinkles']
+    grape_pixels = counts['grapes']
+    eye_pixels = counts['eyes']
     
     # Debug: Show pixel counts
-    print(f"  Pixel counts: Red={red_pixels}, Green={green_pixels}, Blue={blue_pixels}, Grapes={grape_pixels}, Eyes={eye_pixels}")
+    if verbose:
+        LOG.debug('pixel_counts', "  Pixel counts: Red={red}, Green={green}, Blue={blue}, Grapes={grapes}, Eyes={eyes}",
+                  red=red_pixels, green=green_pixels, blue=blue_pixels, grapes=grape_pixels, eyes=eye_pixels)
     
     # Smart glaze logic: Red and green are mutually exclusive
     # Use whichever has MORE pixels. If neither detected, default to green.
@@ -212,10 +296,12 @@ def detect_elements(img):
         # Both detected - use the one with more pixels
         if green_pixels > red_pixels:
             detected['red_glaze'] = False
-            print(f"  → Green wins: {green_pixels} vs {red_pixels} pixels")
+            if verbose:
+                LOG.debug('glaze_choice', "  → Green wins: {green} vs {red} pixels", green=green_pixels, red=red_pixels)
         else:
             detected['green_glaze'] = False
-            print(f"  → Red wins: {red_pixels} vs {green_pixels} pixels")
+            if verbose:
+                LOG.debug('glaze_choice', "  → Red wins: {red} vs {green} pixels", red=red_pixels, green=green_pixels)
     elif detected['red_glaze']:
         detected['green_glaze'] = False
     elif detected['green_glaze']:
@@ -223,37 +309,176 @@ def detect_elements(img):
     else:
         # Neither detected - default to green
         detected['green_glaze'] = True
-        print("  → Glaze fallback: Defaulting to green glaze")
+        if verbose:
+            LOG.debug('glaze_fallback', "  → Glaze fallback: Defaulting to green glaze")
     
     return detected
 
 
+def detect_confident(img, seq=None):
+    """Detect elements, re-capturing up to CONFIDENCE['extra_frames'] more frames while any decision is unsure.
+
+    Counts are averaged over the frames taken, so a one-frame glitch near a
+    threshold cannot flip a key. Returns (detected, uncertain decisions left).
+    """
+    counts = count_pattern(img, seq=seq)
+    confidence = element_confidence(counts)
+    uncertain = [name for name, score in confidence.items() if score < 1.0]
+    if uncertain:
+        frames = [counts]
+        with stage_metrics.timer('recapture'):
+            for _ in range(CONFIDENCE['extra_frames']):
+                clock.sleep(CONFIDENCE['interval'])
+                extra = RECAPTURE.grab(['pattern']).view('pattern')
+                if PIPELINE.recorder is not None:
+                    PIPELINE.recorder.record('pattern', extra, RECAPTURE.timestamp)
+                frames.append(count_pattern(extra))
+                counts = {element: round(sum(f[element] for f in frames) / len(frames)) for element in THRESHOLDS}
+                confidence = element_confidence(counts)
+                uncertain = [name for name, score in confidence.items() if score < 1.0]
+                if not uncertain:
+                    break
+        LOG.debug('recapture', "  Re-captured {extra} frame(s) near thresholds, still unsure: {uncertain}",
+                  extra=len(frames) - 1, uncertain=uncertain or 'none')
+    return decide_elements(counts), uncertain
+
+
+def classify_pattern(img, seq=None):
+    """Confidence-checked detection through the pattern cache - repeated patterns skip classification"""
+    key = CACHE.key(img)
+    detected = CACHE.get(key)
+    if detected is not None:
+        LOG.debug('pattern_cache_hit', "  Pattern cache hit ({rate:.0%} hit rate)", rate=CACHE.hit_rate())
+        return detected
+    detected, uncertain = detect_confident(img, seq)
+    if not uncertain:
+        CACHE.put(key, detected)  # never remember a coin flip
+    return detected
+
+
+def pattern_fingerprint():
+    """Everything a cached detection result depends on"""
+    return f"{config_hash()}:{sorted(THRESHOLDS.items())}:{REGIONS['pattern'][2:]}"
+
+
+def load_pattern_cache():
+    if PATTERN_CACHE['persist']:
+        loaded = CACHE.load(PATTERN_CACHE_FILE, pattern_fingerprint())
+        if loaded:
+            LOG.info('pattern_cache_load', "Loaded {count} cached patterns", count=loaded)
+
+
+def save_pattern_cache():
+    stats = CACHE.stats()
+    if stats['hits'] or stats['misses']:
+        LOG.info('pattern_cache', "Pattern cache: {hits} hits / {misses} misses ({hit_rate:.0%}), "
+                 "{entries} patterns, {evictions} evicted", **stats)
+    if PATTERN_CACHE['persist'] and CACHE.entries:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            CACHE.save(PATTERN_CACHE_FILE, pattern_fingerprint())
+        except OSError:
+            pass  # read-only checkout - start cold next run
+
+
+@timed('key_dispatch')
 def press_keys(detected_elements):
     """Press the keys for detected elements"""
-    time.sleep(0.1)  # Wait for pattern to fully appear
-    
-    keys_to_press = []
-    for element, is_present in detected_elements.items():
-        if is_present:
-            keys_to_press.append(KEYBINDS[element])
+    elements = [element for element, is_present in detected_elements.items() if is_present]
+    keys_to_press = [KEYBINDS[element] for element in elements]
     
-    print(f"Detected elements: {[k for k, v in detected_elements.items() if v]}")
-    print(f"Pressing keys: {keys_to_press}")
-    
-    for key in keys_to_press:
-        pydirectinput.press(key)
-        time.sleep(0.02)  # Small delay between keypresses
+    stamps = dispatch(key_batch(keys_to_press), INPUT_SPACING)
+    LOG.debug('keys_pressed', "Detected elements: {elements}\nPressing keys: {keys}",
+              elements=elements, keys=keys_to_press)
+    return stamps
+
+
+def report_pattern(count):
+    LOG.info('pattern_done', "Pattern {count} completed - waiting for next...", count=count)
+
+
+# Capture, detection and key input run as overlapping stages
+PIPELINE = PatternPipeline(
+    TICK,
+    detect=classify_pattern,
+    act=press_keys,
+    watcher=WATCHER,
+    on_pattern=report_pattern,
+    settle=SettleDetector(**PATTERN_SETTLE)
+)
+
+
+def start_recording(path):
+    """Record the frames patterns were decided on and every checkmark/rewards change to a session at path"""
+    PIPELINE.recorder = WATCHER.recorder = SessionRecorder(path, TICK.regions)
+    LOG.info('recording_start', "Recording session to {path}/", path=path)
+
+
+def stop_recording():
+    recorder = PIPELINE.recorder
+    if recorder is None:
+        return
+    recorder.close()
+    PIPELINE.recorder = WATCHER.recorder = None
+    LOG.info('recording_stop', "Recorded {count} frames to {path}/", count=recorder.count, path=recorder.path)
+
+
+def locate_ui():
+    """Fit the region layout to this screen once at startup (no-op without an anchor capture)"""
+    placement = REGISTRY.resolve(get_backend().screen_size())
+    if placement is not None:
+        LOG.info('layout', "UI located ({how}): scale {scale:.3f}, offset ({dx:.0f}, {dy:.0f}), match {score:.2f}",
+                 how='cached' if placement['cached'] else 'searched', scale=placement['scale'],
+                 dx=placement['offset'][0], dy=placement['offset'][1], score=placement['score'])
+    elif REGISTRY.load_anchor() is not None:
+        LOG.warning('layout_not_found', "Could not find the game UI - using the configured regions")
+    return placement
+
+
+def start_bus(name=BUS_NAME):
+    """Publish every grabbed region and its class counts to a shared-memory FrameBus"""
+    TICK.bus = WATCHER.tick.bus = FrameBus.create(TICK.regions, CLASSIFIER.classes, name=name)
+    LOG.info('bus_start', "Publishing frames to shared memory '{name}'", name=TICK.bus.shm.name)
+
+
+def stop_bus():
+    bus = TICK.bus
+    if bus is not None:
+        TICK.bus = WATCHER.tick.bus = None
+        bus.close()
+
+
+def start_metrics(path, interval=30.0):
+    """Export per-stage latency histograms to path every `interval` seconds"""
+    METRICS.reset()
+    LOG.info('metrics_start', "Exporting stage metrics to {path} every {interval:.0f}s", path=path, interval=interval)
+    return MetricsExporter(METRICS, path, interval).start()
+
+
+def run_patterns():
+    """Solve patterns until the rewards screen appears, returns pattern count"""
+    return PIPELINE.run()
 
 
 def test_detection():
     """Test detection on current screen (for calibration)"""
-    print("Testing detection in 3 seconds... Alt-tab to game!")
-    time.sleep(3)
-    
-    img = capture_pattern()
+    try:
+        # A running bot publishes its frames - read its latest pattern instead of grabbing
+        bus = FrameBus.attach()
+    except FileNotFoundError:
+        bus = None
+    frame = bus.wait('pattern') if bus is not None else None
+    if frame is not None:
+        print(f"Using frame {frame.seq} from the running bot")
+        img = frame.image
+    else:
+        print("Testing detection in 3 seconds... Alt-tab to game!")
+        clock.sleep(3)
+        img = capture_pattern()
     cv2.imwrite('test_capture.png', img)
     
     detected = detect_elements(img)
+    LOG.flush()
     
     print("\n=== Detection Results ===")
     for element, is_present in detected.items():
@@ -261,41 +486,44 @@ def test_detection():
         print(f"{element}: {status}")
 
 
-def run_automation():
-    """Run the automation loop"""
-    print(f"Starting automation in 5 seconds... Alt-tab to game!")
-    print("Will run until rewards screen appears")
-    print("Press Ctrl+C to stop early")
-    time.sleep(5)
+def run_automation(record=None, metrics=None, bus=False, locate=True):
+    """Run the automation loop, optionally recording frames to the `record`
+    directory, exporting stage metrics to the `metrics` file and publishing
+    frames to the shared-memory bus. `locate` fits the regions to the screen first."""
+    LOG.info('automation_start', "Starting automation in 5 seconds... Alt-tab to game!\n"
+             "Will run until rewards screen appears\nPress Ctrl+C to stop early")
+    clock.sleep(5)
     
-    start_time = time.time()
-    count = 0
+    if locate:
+        locate_ui()
+    if record:
+        start_recording(record)
+    exporter = start_metrics(metrics) if metrics else None
+    if bus:
+        start_bus()
+    load_pattern_cache()
+    start_time = clock.now()
     
     try:
-        while True:
-            # Check for rewards screen
-            if is_rewards_screen():
-                claim_rewards()
-                break
-            
-            img = capture_pattern()
-            detected = detect_elements(img)
-            press_keys(detected)
-            
-            count += 1
-            print(f"Pattern {count} completed - waiting for next...")
-            
-            # Wait for checkmark cycle, break if rewards appear
-            if not wait_for_checkmark_cycle():
-                claim_rewards()
-                break
+        run_patterns()
+        claim_rewards()
     
     except KeyboardInterrupt:
-        print("\nStopped by user")
+        LOG.info('stopped', "\nStopped by user")
+    
+    finally:
+        stop_recording()
+        stop_bus()
+        save_pattern_cache()
+        if exporter:
+            exporter.stop()
     
-    elapsed = time.time() - start_time
-    print(f"\nCompleted {count} patterns in {elapsed:.1f} seconds")
-    print(f"Average: {elapsed/count:.2f}s per pattern" if count > 0 else "")
+    count = PIPELINE.count
+    elapsed = clock.now() - start_time
+    LOG.info('automation_done', "\nCompleted {count} patterns in {elapsed:.1f} seconds", count=count, elapsed=elapsed)
+    if count > 0:
+        LOG.info('automation_average', "Average: {average:.2f}s per pattern", average=elapsed / count)
+    LOG.flush()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,268 @@
+"""Drive several game clients from one machine.
+
+One capture stage grabs the union of every client's regions per tick into a
+shared-memory buffer. Each client runs the full auto_loop state machine in
+its own worker process, reading its regions out of that buffer and sending
+input to its own window.
+
+Profiles are a JSON list, one entry per client:
+
+    [{"name": "alt1", "window": "Roblox",
+      "regions": {"pattern": [12, 188, 204, 202], ...},
+      "buttons": {"claim": [321, 678], "exit": [316, 822]}}, ...]
+
+Anything a profile leaves out keeps its detector_config value.
+"""
+import contextlib
+import json
+import multiprocessing as mp
+import os
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import clock
+import frame_sources
+import input_dispatch
+
+HEADER = 8  # int64 sequence counter in front of the pixels - odd while a frame is being written
+
+
+def load_profiles(path):
+    with open(path, encoding='utf-8') as f:
+        profiles = json.load(f)
+    for i, profile in enumerate(profiles):
+        profile.setdefault('name', f'client{i + 1}')
+    return profiles
+
+
+def client_regions(profile):
+    """Every screen region the client reads, with detector_config defaults filled in"""
+    from detector_config import REGIONS
+    regions = dict(REGIONS)
+    regions.update({name: tuple(r) for name, r in profile.get('regions', {}).items()})
+    return regions
+
+
+class SharedFrame:
+    """Latest captured frame in shared memory, guarded by a sequence lock.
+
+    The writer bumps the counter to odd, copies the pixels and bumps it to
+    even again; readers retry any copy during which the counter moved.
+    """
+
+    def __init__(self, box, name=None):
+        self.box = tuple(box)
+        _, _, w, h = self.box
+        size = HEADER + h * w * 3
+        self.owner = name is None
+        # Workers are spawned children sharing the parent's resource tracker,
+        # so attaching here does not make them unlink the block on exit
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.seq = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.pixels = np.ndarray((h, w, 3), dtype=np.uint8, buffer=self.shm.buf, offset=HEADER)
+        if self.owner:
+            self.seq[0] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def publish(self, frame):
+        self.seq[0] += 1
+        self.pixels[...] = frame
+        self.seq[0] += 1
+
+    def read(self, regions, last_seq=-1, timeout=1.0):
+        """Copy `regions` out of one frame newer than last_seq (the latest on timeout) -> (seq, images)"""
+        bx, by, bw, bh = self.box
+        for x, y, w, h in regions:
+            if x < bx or y < by or x + w > bx + bw or y + h > by + bh:
+                raise ValueError(f"Region {(x, y, w, h)} is outside the shared capture {self.box}")
+        deadline = clock.now() + timeout
+        while True:
+            seq = int(self.seq[0])
+            if seq % 2 == 0 and (seq > last_seq or clock.now() >= deadline):
+                images = [self.pixels[y - by:y - by + h, x - bx:x - bx + w].copy() for x, y, w, h in regions]
+                if int(self.seq[0]) == seq:
+                    return seq, images
+            else:
+                clock.sleep(0.001)
+
+    def close(self):
+        self.seq = self.pixels = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedFrameSource(frame_sources.FrameSource):
+    """FrameSource for a worker - every grab is a crop of the parent's latest capture"""
+
+    def __init__(self, shared):
+        self.shared = shared
+        self._local = threading.local()  # last sequence handed to each thread
+
+    def grab(self, region):
+        return self.grab_many([region])[0]
+
+    def grab_many(self, regions):
+        # Wait for a capture newer than the last one this thread got, so its
+        # polling loop runs at the capture rate instead of spinning on a stale
+        # frame; every region of a tick comes from that one capture
+        seq, images = self.shared.read(regions, getattr(self._local, 'seq', -1))
+        self._local.seq = seq
+        return images
+
+    def close(self):
+        self.shared.close()
+
+
+class TargetedInputBackend(input_dispatch.InputBackend):
+    """Sends input to one client window.
+
+    All workers share one lock and one "focused client" slot: a dispatch
+    batch holds the lock from first to last event, and only re-activates its
+    window when another client had the focus in between.
+    """
+
+    def __init__(self, backend, index, window, lock, focused):
+        self.backend = backend
+        self.index = index
+        self.window = window
+        self.lock = lock
+        self.focused = focused
+
+    def _focus(self):
+        if self.window and self.focused.value != self.index:
+            import pygetwindow
+            windows = pygetwindow.getWindowsWithTitle(self.window)
+            if not windows:
+                raise RuntimeError(f"No window titled '{self.window}'")
+            windows[0].activate()
+            clock.sleep(0.05)  # let the OS finish the focus switch
+        self.focused.value = self.index
+
+    @contextlib.contextmanager
+    def batch(self):
+        with self.lock:
+            self._focus()
+            yield
+
+    def _send(self, action, *args):
+        with self.batch():
+            return getattr(self.backend, action)(*args)
+
+    def press(self, key):
+        self._send('press', key)
+
+    def key_down(self, key):
+        self._send('key_down', key)
+
+    def key_up(self, key):
+        self._send('key_up', key)
+
+    def move(self, x, y):
+        self._send('move', x, y)
+
+    def move_rel(self, dx, dy):
+        self._send('move_rel', dx, dy)
+
+    def click(self):
+        self._send('click')
+
+    def screen_size(self):
+        return self.backend.screen_size()
+
+
+def _client_main(index, profile, shm_name, box, lock, focused, max_rounds, headless, log_level):
+    """Worker process: configure this client, then run the normal auto_loop"""
+    import detector_config
+    detector_config.apply_profile(profile)
+
+    from event_log import LOG
+    LOG.tag = profile['name']
+    if log_level:
+        LOG.set_level(log_level)
+
+    import main
+    # Clients differ in layout/thresholds - each keeps its own pattern cache
+    main.PATTERN_CACHE_FILE = os.path.join(detector_config.CACHE_DIR, f"patterns-{profile['name']}.json")
+
+    frame_sources.set_source(SharedFrameSource(SharedFrame(box, shm_name)))
+    backend = input_dispatch.RecordingBackend() if headless else input_dispatch.DirectInputBackend()
+    input_dispatch.set_backend(TargetedInputBackend(backend, index, profile.get('window'), lock, focused))
+
+    import auto_game_loop
+    try:
+        auto_game_loop.auto_loop(max_rounds=max_rounds, locate=False)  # profiles carry their own layout
+    except KeyboardInterrupt:
+        pass
+
+
+def _capture_loop(shared, stop, interval, failure):
+    """Publish a capture every `interval` seconds; on error record it in `failure` and set `stop`"""
+    try:
+        while not stop.is_set():
+            start = clock.now()
+            shared.publish(frame_sources.grab(shared.box))
+            remaining = interval - (clock.now() - start)
+            if remaining > 0:
+                clock.sleep(remaining)
+    except Exception as e:
+        failure.append(e)
+        stop.set()
+
+
+def run_clients(profiles, max_rounds=None, fps=30.0, headless=False, log_level=None):
+    """Run one auto_loop worker per profile off a single shared capture.
+
+    Returns {client name: exit code}. If the shared capture fails, the
+    workers are terminated and RuntimeError is raised from the capture error.
+    """
+    from frame_tick import bounding_box
+    from event_log import LOG
+
+    box = bounding_box([r for p in profiles for r in client_regions(p).values()])
+    shared = SharedFrame(box)
+    ctx = mp.get_context('spawn')
+    lock = ctx.RLock()  # batch() re-enters it per event
+    focused = ctx.Value('i', -1, lock=False)
+
+    stop = threading.Event()
+    failure = []
+    capture = threading.Thread(target=_capture_loop, args=(shared, stop, 1.0 / fps, failure), daemon=True)
+    capture.start()
+
+    workers = [ctx.Process(target=_client_main, name=p['name'],
+                           args=(i, p, shared.name, box, lock, focused, max_rounds, headless, log_level))
+               for i, p in enumerate(profiles)]
+    LOG.info('clients_start', "Starting {count} clients, capturing {box} at {fps:.0f} fps",
+             count=len(workers), box=box, fps=fps)
+    for worker in workers:
+        worker.start()
+    try:
+        # Workers would carry on against the last published frame - stop them with the capture
+        while not stop.is_set() and any(worker.is_alive() for worker in workers):
+            stop.wait(0.1)
+        if failure:
+            LOG.error('capture_failed', "Shared capture failed ({error}) - stopping clients", error=failure[0])
+            for worker in workers:
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        LOG.info('stopped', "\nStopping clients...")
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+    finally:
+        stop.set()
+        capture.join()
+        shared.close()
+    LOG.flush()
+    if failure:
+        raise RuntimeError("Shared capture failed") from failure[0]
+    return {worker.name: worker.exitcode for worker in workers}
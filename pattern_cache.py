@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import cv2
+
+
+def pattern_key(img, size=16, shift=3):
+    """Perceptual key: area-averaged size x size thumbnail with each channel cut to 8 - shift bits.
+
+    16x16 keeps an 8px topping at a third of its cell, so every element
+    combination gets its own key; frames that straddle a quantization step
+    just miss and get classified normally.
+    """
+    thumb = cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA)
+    return hashlib.blake2b((thumb >> shift).tobytes(), digest_size=16).hexdigest()
+
+
+class PatternCache:
+    """Bounded LRU of pattern key -> detected element set.
+
+    The mini-game draws patterns from a small set of combinations, so after
+    a round or two most settled frames are repeats and skip classification.
+    """
+
+    def __init__(self, capacity=64, size=16, shift=3):
+        self.capacity = capacity
+        self.size = size
+        self.shift = shift
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, img):
+        return pattern_key(img, self.size, self.shift)
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return dict(result)
+
+    def put(self, key, result):
+        self.entries[key] = dict(result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hit_rate()}
+
+    def save(self, path, fingerprint):
+        """Write entries (oldest first) tagged with the detector config they came from"""
+        data = {'fingerprint': fingerprint, 'size': self.size, 'shift': self.shift,
+                'entries': list(self.entries.items())}
+        tmp = f'{path}.{os.getpid()}.tmp'  # other processes may be saving the same file
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def load(self, path, fingerprint):
+        """Load entries saved under the same fingerprint and key settings; returns how many"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get('fingerprint') != fingerprint or (data.get('size'), data.get('shift')) != (self.size, self.shift):
+            return 0  # thresholds, colors or key settings changed - results no longer apply
+        for key, result in data['entries']:
+            self.put(key, result)
+        return len(data['entries'])
@@ -0,0 +1,193 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import clock
+import stage_metrics
+
+
+class FrameRing:
+    """Small ring of captured frames between the capture and detect stages.
+
+    When detection falls behind the oldest frame is overwritten, so the
+    detector always works on recent pixels.
+    """
+
+    def __init__(self, size=4):
+        self.frames = deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, frame):
+        with self.cond:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(frame)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        with self.cond:
+            if not self.frames:
+                self.cond.wait(timeout)
+            if not self.frames:
+                return None
+            return self.frames.popleft()
+
+    def clear(self):
+        with self.cond:
+            self.frames.clear()
+
+
+class PatternPipeline:
+    """Capture -> detect -> input as three overlapping threads.
+
+    While a pattern is expected the capture stage grabs the pattern and
+    rewards regions into a FrameRing; the detect stage waits for the pattern
+    to settle, classifies it and queues the key set. The checkmark/rewards
+    phase that follows is polled by a ScreenWatcher from the detect stage -
+    adaptive rate, unchanged ROIs not classified again - and the input
+    stage arms it as soon as the keys are out. The capture stage idles
+    until the checkmark has cleared and the next pattern is due.
+
+    The watcher must emit 'checkmark_appeared', 'checkmark_cleared' and
+    'rewards_shown' from probes named 'checkmark' and 'rewards'.
+
+    run() returns when the rewards screen is seen (or stop() is called); the
+    caller handles the claim.
+    """
+
+    REGIONS = ('pattern', 'rewards')
+
+    def __init__(self, tick, detect, act, watcher, interval=0.01, ring_size=4, on_pattern=None, settle=None):
+        self.tick = tick
+        self.detect = detect
+        self.act = act
+        self.watcher = watcher
+        self.interval = interval
+        self.ring = FrameRing(ring_size)
+        self.on_pattern = on_pattern
+        self.settle = settle
+        self.recorder = None  # optional SessionRecorder fed the frames patterns were decided on
+        self.actions = queue.Queue()
+        self.capturing = threading.Event()
+        self.stopped = threading.Event()
+        self.count = 0
+        self.reason = None
+        self.error = None
+
+    def stop(self, reason='stopped'):
+        if self.reason is None:
+            self.reason = reason
+        self.stopped.set()
+
+    def _stage(self, target):
+        def run():
+            try:
+                target()
+            except Exception as e:
+                self.error = e
+                self.stop('error')
+        return threading.Thread(target=run, daemon=True)
+
+    def _capture(self):
+        while not self.stopped.is_set():
+            if not self.capturing.wait(0.1):
+                continue
+            self.ring.put(self.tick.grab(self.REGIONS).snapshot())
+            clock.sleep(self.interval)
+
+    def _record(self, frame, region, result=None):
+        if self.recorder is not None:
+            self.recorder.record(region, frame.view(region), frame.timestamp, result)
+
+    def _read_pattern(self):
+        """Captured frames until the pattern settles -> detected elements; None once the round is over"""
+        if self.settle is not None:
+            self.settle.reset()
+        since = clock.now()
+        self.capturing.set()
+        try:
+            while not self.stopped.is_set():
+                frame = self.ring.get(timeout=0.1)
+                if frame is None or frame.timestamp < since:
+                    continue  # grabbed before the last checkmark cleared
+                if 'rewards_shown' in self.watcher.update(frame, ['rewards']):
+                    self.stop('rewards')
+                    break
+                img = frame.view('pattern')
+                if self.settle is not None and self.settle.feed(img, frame.timestamp) is None:
+                    continue
+                self.capturing.clear()
+                detected = self.detect(img, frame.seqs.get('pattern'))
+                self._record(frame, 'pattern', detected)
+                return detected
+        finally:
+            self.capturing.clear()
+            self.ring.clear()
+        return None
+
+    def _wait_event(self, event):
+        """Let the watcher poll until `event` fires; False if the rewards screen showed or the pipeline stopped"""
+        while not self.stopped.is_set():
+            fired = self.watcher.wait_for(('rewards_shown', event), timeout=0.1)
+            if fired == 'rewards_shown':
+                self.stop('rewards')
+                return False
+            if fired == event:
+                return True
+        return False
+
+    def _detect(self):
+        pattern_start = time.perf_counter()
+        while not self.stopped.is_set():
+            detected = self._read_pattern()
+            if detected is None:
+                break
+            self.actions.put(detected)
+            waiting_since = time.perf_counter()
+            stage_metrics.record('settle_detect', waiting_since - pattern_start)
+
+            self.watcher.arm()
+            if not self._wait_event('checkmark_appeared') or not self._wait_event('checkmark_cleared'):
+                break
+            now = time.perf_counter()
+            stage_metrics.record('checkmark_wait', now - waiting_since)
+            stage_metrics.record('pattern', now - pattern_start)
+            pattern_start = now
+
+    def _input(self):
+        while not self.stopped.is_set():
+            try:
+                detected = self.actions.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.act(detected)
+            self.watcher.arm()  # checkmark is due any moment now
+            self.count += 1
+            if self.on_pattern:
+                self.on_pattern(self.count)
+
+    def run(self):
+        """Run until the rewards screen appears; returns patterns completed"""
+        self.stopped.clear()
+        self.capturing.clear()
+        self.ring.clear()
+        self.actions = queue.Queue()
+        self.count = 0
+        self.reason = None
+        self.error = None
+        self.watcher.reset()
+        stages = [self._stage(self._capture), self._stage(self._detect), self._stage(self._input)]
+        for stage in stages:
+            stage.start()
+        try:
+            while not self.stopped.wait(0.1):
+                pass
+        finally:
+            self.stop()
+            for stage in stages:
+                stage.join()
+        if self.error is not None:
+            raise self.error
+        return self.count
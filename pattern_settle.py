@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+
+import clock
+
+
+def thumbnail_digest(img, size=12):
+    """Cheap signature: area-averaged size x size thumbnail"""
+    return cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class SettleDetector:
+    """Report a region as settled once `frames` consecutive signatures agree.
+
+    feed() takes consecutive frames of the same region and returns the frame
+    to act on - the latest one once settled, or whatever arrived last when
+    `deadline` seconds have passed since the first frame - and None while the
+    region is still animating in.
+    """
+
+    def __init__(self, frames=3, deadline=0.25, tolerance=6, signature=thumbnail_digest):
+        self.frames = frames
+        self.deadline = deadline
+        self.tolerance = tolerance
+        self.signature = signature
+        self.reset()
+
+    def reset(self):
+        self.started = None
+        self.last = None
+        self.streak = 0
+        self.timed_out = False
+
+    def feed(self, img, now=None):
+        now = clock.now() if now is None else now
+        if self.started is None:
+            self.started = now
+
+        sig = self.signature(img)
+        if self.last is not None and np.abs(sig - self.last).max() <= self.tolerance:
+            self.streak += 1
+        else:
+            self.streak = 1
+        self.last = sig
+
+        if self.streak >= self.frames:
+            return img
+        if now - self.started >= self.deadline:
+            self.timed_out = True
+            return img
+        return None
+
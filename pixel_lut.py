@@ -0,0 +1,173 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+import stage_metrics
+
+
+def hsv_ranges(spec):
+    """Turn a {'lower': .., 'upper': ..} or {'lower1': .., 'upper1': .., ...} entry into (lower, upper) pairs"""
+    ranges = []
+    for key in sorted(spec):
+        if key.startswith('lower'):
+            suffix = key[len('lower'):]
+            ranges.append((np.asarray(spec[key]), np.asarray(spec['upper' + suffix])))
+    return ranges
+
+
+class PixelClassifier:
+    """Color -> class bitflag lookup table built from HSV ranges.
+
+    The table is indexed directly by quantized BGR, so classifying a frame is
+    one gather plus one np.bincount over the flag image - no HSV conversion
+    and no per-class inRange/countNonZero passes. With bits=8 the table covers
+    every BGR color exactly (16 MB) and matches cv2.inRange pixel for pixel.
+    """
+
+    def __init__(self, classes=None, bits=8):
+        self.bits = bits
+        self.classes = {}
+        self.table = None
+        self.membership = None
+        for name, ranges in (classes or {}).items():
+            self.add(name, ranges)
+
+    def add(self, name, ranges):
+        """Register a class given a list of (lower, upper) HSV bounds"""
+        if name not in self.classes and len(self.classes) >= 16:
+            raise ValueError("PixelClassifier supports at most 16 classes")
+        self.classes[name] = list(ranges)
+        self.table = None  # rebuilt lazily on next use
+
+    def build(self):
+        levels = 1 << self.bits
+        shift = 8 - self.bits
+        # Every quantized color, sampled at the centre of its bin
+        values = (np.arange(levels, dtype=np.uint16) << shift) + ((1 << shift) >> 1)
+        b, g, r = np.meshgrid(values, values, values, indexing='ij')
+        colors = np.stack([b.ravel(), g.ravel(), r.ravel()], axis=-1).astype(np.uint8)
+        hsv = cv2.cvtColor(colors.reshape(-1, levels, 3), cv2.COLOR_BGR2HSV)
+
+        dtype = np.uint8 if len(self.classes) <= 8 else np.uint16
+        table = np.zeros(hsv.shape[:2], dtype=dtype)
+        for bit, ranges in enumerate(self.classes.values()):
+            mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
+            for lower, upper in ranges:
+                cv2.bitwise_or(mask, cv2.inRange(hsv, lower, upper), dst=mask)
+            table[mask > 0] |= dtype(1 << bit)
+        self.table = table.ravel()
+
+        # membership[flag, class] is 1 when that flag value includes the class bit
+        flags = np.arange(1 << (8 * table.itemsize), dtype=np.int64)
+        bits = np.arange(len(self.classes), dtype=np.int64)
+        self.membership = ((flags[:, None] >> bits[None, :]) & 1).astype(np.int64)
+        return self
+
+    def save(self, path):
+        """Write the compiled table to an .npz file"""
+        if self.table is None:
+            self.build()
+        tmp = f'{path}.{os.getpid()}.tmp.npz'  # other processes may be saving the same file
+        np.savez(tmp, table=self.table, membership=self.membership,
+                 classes=np.array(list(self.classes)), bits=self.bits)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Load a table written by save(); ValueError if it was built for other classes"""
+        with np.load(path) as data:
+            if list(data['classes']) != list(self.classes) or int(data['bits']) != self.bits:
+                raise ValueError(f"{path} was compiled for different classes")
+            self.table = data['table']
+            self.membership = data['membership']
+        return self
+
+    def flags(self, img):
+        """Per-pixel class bitflags for a BGR image"""
+        if self.table is None:
+            self.build()
+        shift = 8 - self.bits
+        q = img >> shift if shift else img
+        idx = q[..., 0].astype(np.uint32)
+        idx <<= self.bits
+        idx |= q[..., 1]
+        idx <<= self.bits
+        idx |= q[..., 2]
+        return self.table[idx]
+
+    def count(self, img):
+        """Pixel count per class in one pass over the image"""
+        with stage_metrics.timer('classify'):
+            flags = self.flags(img)
+            hist = np.bincount(flags.ravel(), minlength=self.membership.shape[0])
+            totals = hist @ self.membership
+        return dict(zip(self.classes, totals.tolist()))
+
+
+class DetectorContext:
+    """Preallocated working buffers for counting with a PixelClassifier.
+
+    PixelClassifier.count allocates the index and flag images on every
+    call; this keeps one set per frame shape (and per thread, so the
+    pipeline and the main loop never share) and runs the whole count with
+    out= arguments. Steady-state polling of the same regions allocates no
+    frame-sized arrays - only the few-KB histogram np.bincount returns.
+    """
+
+    def __init__(self, classifier):
+        self.classifier = classifier
+        self._local = threading.local()
+
+    def _buffers(self, shape):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        entry = buffers.get(shape)
+        if entry is None:
+            classifier = self.classifier
+            if classifier.table is None:
+                classifier.build()
+            entry = buffers[shape] = (
+                np.empty(shape, dtype=np.intp),                 # LUT index (np.take casts anything else)
+                np.empty(shape, dtype=np.intp),                 # channel scratch
+                np.empty(shape, dtype=classifier.table.dtype),  # class flags
+                np.empty(shape, dtype=classifier.table.dtype),  # one class bit
+            )
+        return entry
+
+    def flags(self, img):
+        """Per-pixel class bitflags written into this thread's buffer for img's shape"""
+        classifier = self.classifier
+        idx, scratch, flags, _ = self._buffers(img.shape[:2])
+        bits = classifier.bits
+        shift = 8 - bits
+        np.copyto(idx, img[..., 0], casting='unsafe')
+        if shift:
+            np.right_shift(idx, shift, out=idx)
+        for channel in (1, 2):
+            np.copyto(scratch, img[..., channel], casting='unsafe')
+            if shift:
+                np.right_shift(scratch, shift, out=scratch)
+            np.left_shift(idx, bits, out=idx)
+            np.bitwise_or(idx, scratch, out=idx)
+        np.take(classifier.table, idx, out=flags, mode='clip')  # 'raise' would buffer the output
+        return flags
+
+    def count(self, img, classes=None):
+        """Same result as PixelClassifier.count, computed in preallocated buffers.
+
+        np.bincount would widen the flag image to int64 first, so each class
+        bit is masked into a scratch buffer and counted instead. `classes`
+        limits the counting to those names.
+        """
+        with stage_metrics.timer('classify'):
+            flags = self.flags(img)
+            bit_buffer = self._buffers(img.shape[:2])[3]
+            counts = {}
+            for bit, name in enumerate(self.classifier.classes):
+                if classes is not None and name not in classes:
+                    continue
+                np.bitwise_and(flags, 1 << bit, out=bit_buffer)
+                counts[name] = int(np.count_nonzero(bit_buffer))
+        return counts
@@ -0,0 +1,174 @@
+"""Fit the hardcoded region layout to whatever screen the game is on.
+
+REGIONS/BUTTONS in detector_config are the reference layout. An anchor -
+a reference capture of a static piece of the game UI plus the rectangle
+it was taken from - lets the registry find where (and how large) the UI is
+on this screen with a multi-scale template search, then move and scale
+every region, button and pixel-count threshold to match.
+
+The search result is cached per screen size. Later startups only grab the
+anchor rectangle where the cache says it is and compare it against the
+template; the full search reruns only when that check fails. After
+resolve() everything is plain tuples again, so per-tick cost is unchanged.
+"""
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+import frame_sources
+
+MIN_SCORE = 0.8  # normalized cross-correlation needed to accept a placement
+
+
+class RegionRegistry:
+
+    def __init__(self, regions, buttons, thresholds, anchor_path, cache_path):
+        self.regions = regions
+        self.buttons = buttons
+        self.thresholds = thresholds  # pixel-count dicts, scaled by area
+        self.anchor_path = anchor_path
+        self.cache_path = cache_path
+        self.reference = None
+        self.placement = None
+
+    # -- anchor ----------------------------------------------------------
+
+    def _meta_path(self):
+        return os.path.splitext(self.anchor_path)[0] + '.json'
+
+    def capture_anchor(self, region):
+        """Save the current screen contents of `region` (reference layout) as the anchor"""
+        img = frame_sources.grab(region)
+        cv2.imwrite(self.anchor_path, img)
+        with open(self._meta_path(), 'w') as f:
+            json.dump({'region': list(region)}, f)
+        return img
+
+    def load_anchor(self):
+        """(gray template, reference region, digest), or None when no anchor was captured"""
+        if not os.path.exists(self.anchor_path):
+            return None
+        template = cv2.imread(self.anchor_path, cv2.IMREAD_GRAYSCALE)
+        if template is None:
+            return None
+        with open(self._meta_path()) as f:
+            region = tuple(json.load(f)['region'])
+        digest = hashlib.sha256(template.tobytes()).hexdigest()[:12]
+        return template, region, digest
+
+    # -- placement -------------------------------------------------------
+
+    @staticmethod
+    def _anchor_rect(region, placement):
+        s = placement['scale']
+        dx, dy = placement['offset']
+        x, y, w, h = region
+        return (round(dx + x * s), round(dy + y * s), max(1, round(w * s)), max(1, round(h * s)))
+
+    def verify(self, placement, anchor):
+        """Match score of the anchor where `placement` says it is - one small grab"""
+        template, region, _ = anchor
+        rect = self._anchor_rect(region, placement)
+        if rect[0] < 0 or rect[1] < 0:
+            return 0.0
+        try:
+            img = cv2.cvtColor(np.ascontiguousarray(frame_sources.grab(rect)), cv2.COLOR_BGR2GRAY)
+        except ValueError:
+            return 0.0  # off the captured area (mss's ScreenShotError arrives as ValueError too)
+        scaled = cv2.resize(template, rect[2:], interpolation=cv2.INTER_AREA)
+        return float(cv2.matchTemplate(img, scaled, cv2.TM_CCOEFF_NORMED)[0, 0])
+
+    def search(self, screen, anchor, scales=None):
+        """Multi-scale template search over the whole screen -> placement dict"""
+        template, region, _ = anchor
+        width, height = screen
+        shot = cv2.cvtColor(np.ascontiguousarray(frame_sources.grab((0, 0, width, height))), cv2.COLOR_BGR2GRAY)
+
+        def match(image, scale, factor=1.0):
+            w, h = round(template.shape[1] * scale * factor), round(template.shape[0] * scale * factor)
+            if w < 8 or h < 8 or w > image.shape[1] or h > image.shape[0]:
+                return -1.0, (0, 0), scale
+            scaled = cv2.resize(template, (w, h), interpolation=cv2.INTER_AREA)
+            _, score, _, loc = cv2.minMaxLoc(cv2.matchTemplate(image, scaled, cv2.TM_CCOEFF_NORMED))
+            return score, (loc[0] / factor, loc[1] / factor), scale
+
+        # Coarse sweep over plausible UI scales on a half-size screen...
+        if scales is None:
+            scales = np.geomspace(0.5, 2.0, 25)
+        small = cv2.resize(shot, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+        _, (cx, cy), coarse = max((match(small, s, 0.5) for s in scales), key=lambda r: r[0])
+
+        # ...then refine scale and position at full size around the coarse hit
+        margin = round(max(template.shape) * coarse * 0.25) + 4
+        x1, y1 = max(0, round(cx) - margin), max(0, round(cy) - margin)
+        x2 = min(width, round(cx + template.shape[1] * coarse * 1.1) + margin)
+        y2 = min(height, round(cy + template.shape[0] * coarse * 1.1) + margin)
+        window = shot[y1:y2, x1:x2]
+        score, (fx, fy), scale = max((match(window, s) for s in np.linspace(coarse * 0.9, coarse * 1.1, 41)),
+                                     key=lambda r: r[0])
+        fx, fy = fx + x1, fy + y1
+        return {'scale': float(scale), 'offset': [float(fx - region[0] * scale), float(fy - region[1] * scale)],
+                'score': float(score)}
+
+    # -- cache -----------------------------------------------------------
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, key, placement):
+        cache = self._load_cache()
+        cache[key] = placement
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, 'w') as f:
+                json.dump(cache, f, indent=2)
+        except OSError:
+            pass  # read-only checkout - search again next time
+
+    # -- apply -----------------------------------------------------------
+
+    def apply(self, placement):
+        """Move/scale every region, button and threshold from the reference layout, in place"""
+        if self.reference is None:
+            self.reference = (dict(self.regions), dict(self.buttons), [dict(t) for t in self.thresholds])
+        regions, buttons, thresholds = self.reference
+        s = placement['scale']
+        dx, dy = placement['offset']
+        for name, region in regions.items():
+            self.regions[name] = self._anchor_rect(region, placement)
+        for name, (x, y) in buttons.items():
+            self.buttons[name] = (round(dx + x * s), round(dy + y * s))
+        for live, ref in zip(self.thresholds, thresholds):
+            for name, count in ref.items():
+                live[name] = max(1, round(count * s * s))
+        self.placement = placement
+
+    def resolve(self, screen):
+        """Fit the layout to this screen: cached placement if it still verifies, else search.
+
+        Returns the placement applied, or None (layout left as configured)
+        when there is no anchor or the UI could not be found.
+        """
+        anchor = self.load_anchor()
+        if anchor is None:
+            return None
+        key = f"{screen[0]}x{screen[1]}:{anchor[2]}"
+        placement = self._load_cache().get(key)
+        if placement is not None:
+            placement['score'] = self.verify(placement, anchor)
+            placement['cached'] = True
+        if placement is None or placement['score'] < MIN_SCORE:
+            placement = self.search(screen, anchor)
+            placement['cached'] = False
+            if placement['score'] < MIN_SCORE:
+                return None
+            self._save_cache(key, {'scale': placement['scale'], 'offset': placement['offset']})
+        self.apply(placement)
+        return placement
@@ -0,0 +1,105 @@
+import zlib
+
+import numpy as np
+
+import clock
+
+
+class ScreenWatcher:
+    """Turn binary region probes into events with an adaptive poll rate.
+
+    Each probe is name -> (region, predicate, on_event, off_event). A probe
+    emits on_event when its predicate flips to True and off_event when it
+    flips back (either may be None); predicate(img, seq) also gets the frame's
+    bus sequence number (None when not published). All probes share one FrameTick grab per
+    poll, and a probe whose ROI bytes are unchanged since the last poll keeps
+    its previous state without being classified again. update() runs the
+    same check on a tick grabbed by someone else.
+
+    Polling runs at fast_interval for fast_window seconds after arm() or any
+    event, then backs off geometrically towards slow_interval.
+    """
+
+    def __init__(self, tick, probes, fast_interval=0.01, slow_interval=0.1,
+                 fast_window=0.5, backoff=1.5):
+        self.tick = tick
+        self.probes = probes
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self.fast_window = fast_window
+        self.backoff = backoff
+        self.state = {name: None for name in probes}
+        self.digests = {name: None for name in probes}
+        self.listeners = {}
+        self.interval = fast_interval
+        self.fast_until = 0.0
+        self.polls = 0
+        self.classified = 0
+        self.recorder = None  # optional SessionRecorder fed every state change
+
+    def on(self, event, callback):
+        """Call callback(event, img) whenever event fires"""
+        self.listeners.setdefault(event, []).append(callback)
+
+    def arm(self):
+        """A transition is expected soon - poll at the tight rate"""
+        self.fast_until = clock.now() + self.fast_window
+        self.interval = self.fast_interval
+
+    def reset(self):
+        for name in self.probes:
+            self.state[name] = None
+            self.digests[name] = None
+
+    def poll(self):
+        """Grab once, update every probe, return the events that fired"""
+        regions = [probe[0] for probe in self.probes.values()]
+        self.tick.grab(regions)
+        self.polls += 1
+        return self.update(self.tick)
+
+    def update(self, tick, names=None):
+        """Update the named probes (default: all) from an already grabbed tick, return the events that fired"""
+        fired = []
+        for name in self.probes if names is None else names:
+            region, predicate, on_event, off_event = self.probes[name]
+            img = tick.view(region)
+            digest = zlib.crc32(np.ascontiguousarray(img))
+            if digest == self.digests[name]:
+                continue
+            self.digests[name] = digest
+            self.classified += 1
+
+            present = bool(predicate(img, tick.seqs.get(region)))
+            if self.recorder is not None:
+                self.recorder.record_change(region, img, tick.timestamp, present)
+            previous = self.state[name]
+            self.state[name] = present
+            if present == previous:
+                continue
+            event = on_event if present else (off_event if previous else None)
+            if event:
+                fired.append(event)
+                for callback in self.listeners.get(event, ()):
+                    callback(event, img)
+        if fired:
+            self.arm()
+        return fired
+
+    def next_interval(self):
+        if clock.now() < self.fast_until:
+            return self.fast_interval
+        self.interval = min(self.interval * self.backoff, self.slow_interval)
+        return self.interval
+
+    def wait_for(self, events, timeout=None):
+        """Poll until one of events fires; earlier entries win ties. None on timeout."""
+        deadline = None if timeout is None else clock.now() + timeout
+        while True:
+            fired = self.poll()
+            for event in events:
+                if event in fired:
+                    return event
+            if deadline is not None and clock.now() >= deadline:
+                return None
+            clock.sleep(self.next_interval())
@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('region', 'u1'),
+    ('store', 'u1'),
+    ('slot', '<u4'),
+    ('height', '<u2'),
+    ('width', '<u2'),
+    ('result', '<i4'),
+])
+
+SESSION_VERSION = 2
+
+
+def encode_result(result):
+    """Detection result as an int: dict -> bitflags in key order, bool -> 0/1, None -> -1"""
+    if result is None:
+        return -1
+    if isinstance(result, dict):
+        flags = 0
+        for bit, present in enumerate(result.values()):
+            if present:
+                flags |= 1 << bit
+        return flags
+    return int(result)
+
+
+class GrowableMap:
+    """Append-only memory-mapped array in one file that doubles its capacity when full"""
+
+    def __init__(self, path, item_shape, dtype, capacity=64):
+        self.path = path
+        self.item_shape = tuple(item_shape)
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self.capacity = 0
+        self.array = None
+        self._resize(capacity)
+
+    def _resize(self, capacity):
+        if self.array is not None:
+            self.array.flush()
+        # r+ with a larger shape extends the file in place
+        self.array = np.memmap(self.path, dtype=self.dtype, mode='r+' if self.capacity else 'w+',
+                               shape=(capacity,) + self.item_shape)
+        self.capacity = capacity
+
+    def append(self, value):
+        if self.count == self.capacity:
+            self._resize(self.capacity * 2)
+        self.array[self.count] = value
+        self.count += 1
+        return self.count - 1
+
+    def flush(self):
+        self.array.flush()
+
+
+class SessionRecorder:
+    """Append captured ROI frames to growable memory-mapped stores.
+
+    A session is a directory holding one frames-<region>-<w>x<h>.dat per
+    region and frame size, so every ROI is stored at its own size,
+    index.dat (timestamp, region id, store and slot, frame size and encoded
+    detection result per frame) and meta.json. Recording is a memcpy into
+    the map - no encoding on the hot path - and stores double when full, so
+    a session is only limited by disk space.
+
+    record_change() keeps a frame only when the region's result differs
+    from the last one recorded - for UI states that are polled far more
+    often than they change.
+
+    meta.json is rewritten whenever a store is added. Frame counts are
+    read back from the index, so a session cut short by a crash still
+    reads back up to its last record.
+    """
+
+    def __init__(self, path, regions, capacity=64):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.region_names = list(regions)
+        self.region_ids = {name: i for i, name in enumerate(self.region_names)}
+        self.capacity = capacity  # initial frames per store
+        self.stores = {}  # (region, height, width) -> store id
+        self.frames = []
+        self.last = {}  # region -> last recorded result
+        self.lock = threading.Lock()
+        self.index = GrowableMap(os.path.join(path, 'index.dat'), (), INDEX_DTYPE, capacity * 4)
+        self._write_meta()
+
+    @property
+    def count(self):
+        return self.index.count
+
+    def _write_meta(self):
+        meta = {
+            'version': SESSION_VERSION,
+            'regions': self.region_names,
+            'count': self.index.count,
+            'stores': [{'file': os.path.basename(store.path), 'region': region, 'height': h, 'width': w}
+                       for (region, h, w), store in zip(self.stores, self.frames)],
+        }
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def _append(self, region, img, timestamp, result):
+        h, w = img.shape[:2]
+        store = self.stores.get((region, h, w))
+        if store is None:
+            store = self.stores[(region, h, w)] = len(self.frames)
+            self.frames.append(GrowableMap(os.path.join(self.path, f'frames-{region}-{w}x{h}.dat'),
+                                           (h, w, 3), np.uint8, self.capacity))
+            self._write_meta()  # the reader needs every store's file and shape even if close() never runs
+        slot = self.frames[store].append(img)
+        self.index.append((timestamp, self.region_ids[region], store, slot, h, w, result))
+        self.last[region] = result
+
+    def record(self, region, img, timestamp, result=None):
+        with self.lock:
+            self._append(region, img, timestamp, encode_result(result))
+        return True
+
+    def record_change(self, region, img, timestamp, result):
+        """Record the frame only if `result` differs from the region's last recorded one"""
+        encoded = encode_result(result)
+        with self.lock:
+            if self.last.get(region) == encoded:
+                return False
+            self._append(region, img, timestamp, encoded)
+        return True
+
+    def close(self):
+        with self.lock:
+            for store in self.frames:
+                store.flush()
+            self.index.flush()
+            self._write_meta()
+
+
+class SessionReader:
+    """Read a recorded session back without decoding anything"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != SESSION_VERSION:
+            raise ValueError(f"{path} was recorded in an older session format")
+        self.path = path
+        self.region_names = self.meta['regions']
+        index = np.memmap(os.path.join(path, 'index.dat'), dtype=INDEX_DTYPE, mode='r')
+        # Rows past the last record are still zero-filled - holds after a crash too
+        unused = np.flatnonzero(index['timestamp'] == 0)
+        self.index = index[:unused[0] if len(unused) else len(index)]
+        # One (frames, H, W, 3) array per region and frame size
+        self.stores = [np.memmap(os.path.join(path, store['file']), dtype=np.uint8, mode='r')
+                       .reshape(-1, store['height'], store['width'], 3)
+                       for store in self.meta['stores']]
+
+    def __len__(self):
+        return len(self.index)
+
+    def frame(self, i):
+        entry = self.index[i]
+        return self.stores[entry['store']][entry['slot']]
+
+    def region(self, i):
+        return self.region_names[self.index[i]['region']]
+
+    def iter_region(self, region):
+        """Yield (index, timestamp, frame, result) for one region"""
+        region_id = self.region_names.index(region)
+        for i in np.flatnonzero(self.index['region'] == region_id):
+            entry = self.index[i]
+            yield i, float(entry['timestamp']), self.frame(i), int(entry['result'])
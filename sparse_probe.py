@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+
+import stage_metrics
+
+
+class SparseProbe:
+    """Yes/no UI state check that reads a few dozen pixels instead of the ROI.
+
+    `points` are (y, x) pixels inside the region that are in the state's
+    color class in every reference capture where the state is shown and in
+    none where it is not. At runtime only those pixels are classified: if at
+    least `high` of them are in the class the state is present, at most `low`
+    and it is absent. Anything in between (fades, overlays, a moved window)
+    returns None so the caller falls back to the full ROI count.
+    """
+
+    def __init__(self, state, region, shape, points, low=0.2, high=0.8):
+        self.state = state
+        self.region = region
+        self.shape = tuple(shape)
+        self.points = np.asarray(points, dtype=np.intp).reshape(-1, 2)
+        self.ys = self.points[:, 0]
+        self.xs = self.points[:, 1]
+        self.low = low
+        self.high = high
+        self.votes = 0
+        self.fallbacks = 0
+
+    def vote(self, img, classifier):
+        """True/False from the probe pixels, or None when the vote is ambiguous"""
+        if img.shape[:2] != self.shape:
+            self.fallbacks += 1
+            return None  # region was resized since the probe was built
+        with stage_metrics.timer('probe'):
+            bit = list(classifier.classes).index(self.state)
+            flags = classifier.flags(img[self.ys, self.xs])
+            share = np.count_nonzero((flags >> bit) & 1) / len(self.ys)
+        if share >= self.high:
+            self.votes += 1
+            return True
+        if share <= self.low:
+            self.votes += 1
+            return False
+        self.fallbacks += 1
+        return None
+
+    def to_dict(self):
+        return {'region': self.region, 'shape': list(self.shape), 'points': self.points.tolist(),
+                'low': self.low, 'high': self.high}
+
+    @classmethod
+    def from_dict(cls, state, data):
+        return cls(state, data['region'], data['shape'], data['points'], data['low'], data['high'])
+
+
+def build_probe(state, region, positives, negatives, classifier, size=32, low=0.2, high=0.8, seed=0):
+    """Pick `size` pixels that separate positive from negative reference captures"""
+    bit = list(classifier.classes).index(state)
+    shape = positives[0].shape[:2]
+    if any(img.shape[:2] != shape for img in list(positives) + list(negatives)):
+        raise ValueError(f"Reference captures for '{state}' differ in size")
+
+    stable = np.ones(shape, dtype=bool)
+    for img in positives:
+        stable &= ((classifier.flags(img) >> bit) & 1).astype(bool)
+    for img in negatives:
+        stable &= ~((classifier.flags(img) >> bit) & 1).astype(bool)
+
+    candidates = np.argwhere(stable)
+    if len(candidates) < min(size, 8):
+        raise ValueError(f"Only {len(candidates)} pixels separate '{state}' captures - need more varied references")
+    if len(candidates) > size:
+        rng = np.random.default_rng(seed)
+        candidates = candidates[np.sort(rng.choice(len(candidates), size, replace=False))]
+    return SparseProbe(state, region, shape, candidates, low, high)
+
+
+def build_probes(frames, classifier, state_regions, **options):
+    """Probes for every state with labelled captures.
+
+    `frames` are (name, region, img, expected) tuples as loaded by
+    bench_detection.load_frames; expected 1/0 marks the state shown/hidden.
+    Returns ({state: SparseProbe}, {state: reason skipped}).
+    """
+    probes, skipped = {}, {}
+    for state, region in state_regions.items():
+        positives = [f[2] for f in frames if f[1] == region and f[3] == 1]
+        negatives = [f[2] for f in frames if f[1] == region and f[3] == 0]
+        if not positives:
+            skipped[state] = "no captures with the state shown"
+            continue
+        try:
+            probes[state] = build_probe(state, region, positives, negatives, classifier, **options)
+        except ValueError as e:
+            skipped[state] = str(e)
+    return probes, skipped
+
+
+def save_probes(probes, path):
+    with open(path, 'w') as f:
+        json.dump({state: probe.to_dict() for state, probe in probes.items()}, f)
+
+
+def load_probes(path):
+    """{state: SparseProbe} from a probes file, empty if there is none"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {state: SparseProbe.from_dict(state, entry) for state, entry in data.items()}
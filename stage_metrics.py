@@ -0,0 +1,185 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds: 50 us doubling up to ~100 s
+BUCKETS = tuple(0.00005 * 2 ** i for i in range(22))
+
+
+class Histogram:
+    """Fixed log-spaced latency histogram - recording is a bisect and three adds"""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-th sample (0 when empty)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS + (self.max,), self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.quantile(0.5) * 1000,
+            'p90_ms': self.quantile(0.9) * 1000,
+            'p99_ms': self.quantile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class StageMetrics:
+    """Per-stage latency histograms for the session and for each round"""
+
+    def __init__(self, keep_rounds=100):
+        self.lock = threading.Lock()
+        self.keep_rounds = keep_rounds
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.session = {}
+            self.round = {}
+            self.round_num = None
+            self.rounds = []
+            self.started = time.time()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            hist = self.session.get(stage)
+            if hist is None:
+                hist = self.session[stage] = Histogram()
+            hist.add(seconds)
+            hist = self.round.get(stage)
+            if hist is None:
+                hist = self.round[stage] = Histogram()
+            hist.add(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def begin_round(self, round_num):
+        with self.lock:
+            self.round = {}
+            self.round_num = round_num
+
+    def end_round(self):
+        with self.lock:
+            self.rounds.append({
+                'round': self.round_num,
+                'stages': {stage: hist.summary() for stage, hist in self.round.items()},
+            })
+            del self.rounds[:-self.keep_rounds]
+            self.round = {}
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'uptime_s': time.time() - self.started,
+                'stages': {stage: hist.summary() for stage, hist in self.session.items()},
+                'rounds': list(self.rounds),
+            }
+
+    def prometheus(self):
+        """Session histograms in Prometheus text exposition format"""
+        lines = [
+            '# HELP gingerbread_stage_seconds Hot-path stage latency',
+            '# TYPE gingerbread_stage_seconds histogram',
+        ]
+        with self.lock:
+            for stage, hist in sorted(self.session.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS, hist.counts):
+                    cumulative += n
+                    lines.append(f'gingerbread_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'gingerbread_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                lines.append(f'gingerbread_stage_seconds_sum{{stage="{stage}"}} {hist.total:.6f}')
+                lines.append(f'gingerbread_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+            lines.append(f'gingerbread_rounds_total {len(self.rounds)}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """Write metrics to path - Prometheus text for .prom/.txt, JSON otherwise"""
+        if path.endswith(('.prom', '.txt')):
+            data = self.prometheus()
+        else:
+            data = json.dumps(self.snapshot(), indent=2)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+class MetricsExporter:
+    """Background thread exporting StageMetrics to a file every `interval` seconds"""
+
+    def __init__(self, metrics, path, interval=30.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.metrics.export(self.path)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.metrics.export(self.path)
+
+
+METRICS = StageMetrics()
+
+
+def timer(stage):
+    return METRICS.timer(stage)
+
+
+def record(stage, seconds):
+    METRICS.record(stage, seconds)
+
+
+def timed(stage):
+    """Decorator recording each call's duration under `stage`"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with METRICS.timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate